@@ -3,25 +3,60 @@ import pandas as pd
 import plotly.express as px
 from datetime import date, timedelta, datetime
 
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import images
+import perf
+import stats
+from data_access import DataStore
+
 st.set_page_config(page_title="Wikipedia Political Interest Analysis",layout="wide")
 
+# --- Performance instrumentation (off unless RQ_PERF=1 or the page is opened with ?perf=1) ---
+# ?perf=1 only records (and shows the Performance section) for this session
+if "perf" in st.query_params:
+    st.session_state["perf"] = st.query_params["perf"] == "1"
+_ctx = get_script_run_ctx()
+perf.start_run(_ctx.session_id if _ctx else None, enabled=st.session_state.get("perf", False))
+
+# The section picker is filled in at the bottom, once the sections are defined
+nav = st.container()
 
 
 
 
-#ALL TABS
-main, data_sum, features, classification, hypothesis, graphs, summary = st.tabs(["1.0 Introduction",
-        "2.0 Data Summary",
-        "3.0 New Features",
-        "4.0 Text Classification",
-        "5.0 Hypothesis Testing",
-        "6.0 Interactive Visualization",
-        "7.0 Summary"
-        ])
 
 # --- Load Data ---
-df = pd.read_csv("daily_label_summary.csv")
-sample = pd.read_csv("sample.csv")
+# One DataStore per server process: every session shares the loaded data and cached aggregations
+@st.cache_resource
+def get_store():
+    return DataStore()
+
+store = get_store()
+
+with perf.span("load:summary") as s:
+    df = store.get("summary")
+    s.rows = len(df)
+with perf.span("load:sample") as s:
+    sample = store.get("sample")
+    s.rows = len(sample)
+with perf.span("load:spike_articles") as s:
+    events_df = store.get("spike_articles")
+    s.rows = len(events_df)
+
+
+def show_image(path, caption, width):
+    # Pre-resized and cached bytes: nothing is decoded or re-encoded on reruns
+    with perf.span(f"image:{path}"):
+        st.image(images.load(path, width).data, caption=caption, width=width)
+
+# Most points per country drawn on the political trends line chart
+LINE_CHART_POINTS = 1200
+
+# One process pool for the resampling tests, shared by every session (None on one core)
+@st.cache_resource
+def get_stats_pool():
+    return stats.make_pool()
 
 c_codes = {
     "USA": 'US',
@@ -32,15 +67,13 @@ c_codes = {
 }
 
 
-df['date'] = pd.to_datetime(df['date'])
-
 
 
 
 
 
 
-with main:
+def show_introduction():
     st.title("How do Wikipedia pageviews of political topics vary across countries during the 2023–2024 period, particularly during electoral seasons?")
     st.markdown("---")
 
@@ -112,26 +145,20 @@ I also expect to see an increase in the slope for political pageviews depending
 - Spikes happen when an event may be recent or have current media coverage but don't reflect long-term political engagement
 """)
 
-    image1 = 'StackedBar.jpeg'
-
-    st.image(
-        image1,
+    show_image(
+        'StackedBar.jpeg',
         caption='Stacked Bar Chart that displays an even amount of engagement across all countries, ranging from 28-32%',
         width=1200
     )
 
-    image2 = 'LineChart.jpeg'
-
-    st.image(
-        image2,
+    show_image(
+        'LineChart.jpeg',
         caption='Line Chart that displays different spikes in political pageviews over the course of 2023-2024',
         width=1200
     )
 
-    image3 = 'BarChart.jpeg'
-
-    st.image(
-        image3,
+    show_image(
+        'BarChart.jpeg',
         caption='Bar Chart that displays political and non-political pageviews side-by-side per country',
         width=1200
     )
@@ -139,9 +166,7 @@ I also expect to see an increase in the slope for political pageviews depending
 
 
 
-with data_sum:
-    events_df = pd.read_csv("top_articles_on_spike_days.csv")
-
+def show_data_summary():
     st.header("Data Summary")
     st.markdown("The dataset consists of the **pageviews of the top 10,000 most-viewed Wikipedia articles** across five countries (United States, United Kingdom, Canada, Australia, and India) during the years **2023–2024**.")
     st.markdown("""**Time Interval:** February 2023 – December 2024
@@ -164,7 +189,7 @@ with data_sum:
 
 
 
-with features:
+def show_features():
     st.header("New Features")
     st.markdown("""
 #### get_wikidata_description(qid, retries=5)
@@ -191,7 +216,7 @@ Once each article was labeled in the 5 CSV files, I made a smaller CSV file whic
 
 
 
-with classification:
+def show_classification():
     st.header("Poltical vs Non-Political: Naive Bayes Classifier")
     st.markdown("""
 ### Classification for Identifying politic related articles
@@ -212,10 +237,8 @@ with classification:
 **Accuracy:** 85.18% 
 """)
     
-    image = 'ConfusionMatrix.png'
-
-    st.image(
-        image,
+    show_image(
+        'ConfusionMatrix.png',
         caption='Confusion Matrix for Naive Bayes Text Classifier',
         width=500
     )
@@ -223,7 +246,7 @@ with classification:
 
 
 
-with hypothesis:
+def show_hypothesis():
     st.header("Hypothesis Testing: Country Engagement with Political Topics")
 
     st.markdown("""
@@ -237,7 +260,7 @@ with hypothesis:
 - Non-political articles will dominate overall traffic, but political articles will show sharper temporal fluctuations.
 
 ### Measurement
-To test our hypothesis we are visually comparing changes in political pageviews since the sample is too big and the p-value will not make sense.        
+With ~700 days per country a classic test finds any difference significant, so besides comparing the charts visually we report effect sizes with bootstrap confidence intervals and permutation p-values on the daily political share.
 - Shifts and spikes in political pageviews serve as a proxy for interest in political topics
 - Higher percentages of portion of political pageviews serve as a proxy for more engagement in that country
 - Determining if spikes in pageviews align with elections or other political events
@@ -252,16 +275,79 @@ All countries have the **same mean proportion** of political-page views with lit
 At least one country differs.  
 """)
 
-    image1 = 'StackedBar.jpeg'
-
-    st.image(
-        image1,
+    show_image(
+        'StackedBar.jpeg',
         caption='Stacked Bar Chart that displays an even amount of engagement across all countries, ranging from 28-32%',
         width=1200
     )
 
+    # --- Resampling tests on the daily political share ---
+    min_date, max_date = df['date'].min().date(), df['date'].max().date()
+    start, end = st.slider(
+        "Date range for the tests:",
+        min_value=min_date,
+        max_value=max_date,
+        value=(min_date, max_date),
+        step=timedelta(days=1),
+        key="hyp_range"
+    )
+
+    with perf.span("stats:share_tests") as s:
+        ci, (statistic, p_value) = store.share_tests(start, end, pool=get_stats_pool())
+        s.rows = len(ci)
 
-with graphs:
+    st.subheader("Mean daily political share per country")
+    st.markdown(
+        f"Permutation test of H₀ ({stats.N_RESAMPLES:,} permutations of days between countries): "
+        f"variance of the country means = {statistic:.2e}, **p = {p_value:.4f}**."
+    )
+    if p_value < 0.05:
+        st.markdown("We reject H₀: at least one country's mean political share differs.")
+    else:
+        st.markdown("We cannot reject H₀ for this date range.")
+
+    with perf.span("chart:share_ci"):
+        fig_ci = px.scatter(
+            ci,
+            x="country_code",
+            y="mean_share",
+            error_y=ci["ci_high"] - ci["mean_share"],
+            error_y_minus=ci["mean_share"] - ci["ci_low"],
+            title="Mean daily political share with 95% bootstrap intervals"
+        )
+        fig_ci.update_layout(yaxis_tickformat=".1%")
+    with perf.span("render:share_ci"):
+        st.plotly_chart(fig_ci, use_container_width=True)
+        st.dataframe(ci, hide_index=True)
+
+    # --- Election windows ---
+    st.subheader("Election windows vs the rest of the period")
+    st.markdown("Edit the windows to test other periods; each country's days inside any of its windows are compared with its other days.")
+    windows = st.data_editor(
+        pd.DataFrame(
+            [(code, pd.Timestamp(a).date(), pd.Timestamp(b).date())
+             for code, spans in stats.ELECTION_WINDOWS.items() for a, b in spans],
+            columns=["country_code", "start", "end"]
+        ),
+        num_rows="dynamic",
+        column_config={
+            "start": st.column_config.DateColumn("start"),
+            "end": st.column_config.DateColumn("end"),
+        },
+        hide_index=True,
+        key="hyp_windows"
+    ).dropna()
+    window_spans = {}
+    for code, a, b in windows.itertuples(index=False):
+        window_spans.setdefault(str(code), []).append((str(a), str(b)))
+
+    with perf.span("stats:windows") as s:
+        comparison = store.election_windows(start, end, windows=window_spans, pool=get_stats_pool())
+        s.rows = len(comparison)
+    st.dataframe(comparison, hide_index=True)
+
+
+def show_graphs():
     st.header("Interactive Visualizations")
     st.markdown("""
 - AU: Australia
@@ -283,15 +369,9 @@ with graphs:
     )
 
     min_selected, max_selected = selected_years
-    mask = (df['date'].dt.date >= min_selected) & (df['date'].dt.date <= max_selected)
-    filtered_df = df[mask]
-
-    bar_data = (
-        filtered_df
-        .groupby(["country_code", "label"])["views"]
-        .sum()
-        .reset_index()
-    )
+    with perf.span("agg:label_totals") as s:
+        bar_data = store.label_totals(min_selected, max_selected)
+        s.rows = len(bar_data)
 
     selected_country = st.multiselect(
         "Countries to display:",
@@ -301,16 +381,18 @@ with graphs:
 
     bar_data  = bar_data[bar_data['country_code'].isin(selected_country)]
 
-    fig_bar = px.bar(
-        bar_data,
-        x="country_code",
-        y="views",
-        color="label",
-        barmode="group",
-        title="Political vs Non-Political Pageviews"
-    )
+    with perf.span("chart:bar"):
+        fig_bar = px.bar(
+            bar_data,
+            x="country_code",
+            y="views",
+            color="label",
+            barmode="group",
+            title="Political vs Non-Political Pageviews"
+        )
 
-    st.plotly_chart(fig_bar, use_container_width=True)
+    with perf.span("render:bar"):
+        st.plotly_chart(fig_bar, use_container_width=True)
    
     # --- Line Chart: Political Articles Over Time ---
     st.header("Political Article Trends Over Time")
@@ -326,8 +408,6 @@ with graphs:
     )
 
     min_selected, max_selected = selected_years
-    mask = (df['date'].dt.date >= min_selected) & (df['date'].dt.date <= max_selected)
-    filtered_df = df[mask]
 
     aggregation = st.radio(
         "Show data by:",
@@ -335,20 +415,12 @@ with graphs:
         horizontal=True
     )
 
-    if aggregation == "Daily":
-        grouped = (
-            filtered_df[filtered_df['label'] == "political"]
-            .groupby([pd.Grouper(key='date', freq='D'), 'country_code'])['views']
-            .sum()
-            .reset_index(name='political_views')
-        )
-    else:
-        grouped = (
-            filtered_df[filtered_df['label'] == "political"]
-            .groupby([pd.Grouper(key='date', freq='M'), 'country_code'])['views']
-            .sum()
-            .reset_index(name='political_views')
-        )
+    with perf.span("agg:political_series") as s:
+        # Downsampled to about one point per pixel of the full-width chart; a
+        # narrower date range is downsampled less, so zooming in adds detail
+        grouped = store.political_series(min_selected, max_selected, granularity=aggregation,
+                                         max_points=LINE_CHART_POINTS)
+        s.rows = len(grouped)
 
     selected_country = st.multiselect(
         "Countries to display:",
@@ -359,13 +431,15 @@ with graphs:
 
     grouped = grouped[grouped['country_code'].isin(selected_country)]
 
-    fig_line = px.line(
-        grouped,
-        x="date",
-        y="political_views",
-        color="country_code",
-        title=f"Total Political Article Views Over Time ({aggregation})"
-    )
+    with perf.span("chart:line") as s:
+        fig_line = px.line(
+            grouped,
+            x="date",
+            y="political_views",
+            color="country_code",
+            title=f"Total Political Article Views Over Time ({aggregation})"
+        )
+        s.rows = len(grouped)
 
     fig_line.update_layout(
         legend_title_text="Country",
@@ -373,7 +447,63 @@ with graphs:
         height=500
     )
 
-    st.plotly_chart(fig_line, use_container_width=True)
+    # --- Detected spikes overlay (robust z-score against the previous 4 weeks) ---
+    show_spikes = st.checkbox("Show detected spikes", value=False)
+    if show_spikes:
+        threshold = st.slider("Spike threshold (robust z-score):", 2.0, 20.0, 3.5, step=0.5)
+        if aggregation == "Daily":
+            with perf.span("agg:spikes"):
+                detected = store.spikes(threshold=threshold)
+            detected = detected[
+                detected['country_code'].isin(selected_country) &
+                (detected['date'] >= pd.Timestamp(min_selected)) &
+                (detected['date'] <= pd.Timestamp(max_selected))
+            ]
+            fig_line.add_scatter(
+                x=detected['date'],
+                y=detected['views'],
+                mode="markers",
+                name="Detected spike",
+                marker=dict(symbol="circle-open", size=10, color="black"),
+                customdata=detected['country_code'],
+                text=detected['country_code'] + " (z = " + detected['score'].round(1).astype(str) + ")",
+                hovertemplate="%{x|%Y-%m-%d}: %{y:,}<br>%{text}<extra></extra>"
+            )
+        else:
+            st.caption("Spikes are detected on daily data; switch to Daily to see them.")
+
+    with perf.span("render:line"):
+        event = st.plotly_chart(fig_line, use_container_width=True, on_select="rerun",
+                                selection_mode="points", key="line_chart")
+
+    # --- Drill-down: the most viewed political articles of a clicked day ---
+    points = event.selection.points if event else []
+    if aggregation != "Daily":
+        st.caption("Switch to Daily and click a point to see that day's most viewed political articles.")
+    elif not points:
+        st.caption("Click a point on the line to see that day's most viewed political articles.")
+    else:
+        try:
+            articles = store.get("drilldown")
+        except FileNotFoundError:
+            st.caption("The article drill-down store has not been built yet (python drilldown.py).")
+        else:
+            point = points[0]
+            # Line traces are named after their country; spike markers carry it as customdata
+            country_code = point.get("customdata") or fig_line.data[point["curve_number"]].name
+            if isinstance(country_code, list):
+                country_code = country_code[0]
+            day = pd.Timestamp(point["x"]).date()
+
+            with perf.span("drilldown") as s:
+                top = articles.top(country_code, day, k=10)
+                s.rows = len(top)
+            st.subheader(f"Most viewed political articles: {country_code}, {day}")
+            if top.empty:
+                st.caption("No political articles are stored for that day.")
+            else:
+                st.dataframe(top[["article", "views", "description"]], use_container_width=True,
+                             hide_index=True)
 
     # --- Stacked Bar Chart: Distribution of Labels by Country ---
     st.header("Distribution of Article Types by Country")
@@ -394,53 +524,34 @@ with graphs:
         options=all_labels,
         default=all_labels
     )
-    filtered_df = df[df["label"].isin(selected_labels)]
-
-    mask = (filtered_df['date'].dt.date >= start) & (filtered_df['date'].dt.date <= end)
-    filtered_df = filtered_df[mask]
-
-
-    agg = (
-        filtered_df
-        .groupby(["country_code", "label"])["views"]
-        .sum()
-        .reset_index()
-    )
-
-    all_countries = agg["country_code"].unique()
-
-    full_index = pd.MultiIndex.from_product(
-        [all_countries, all_labels],
-        names=["country_code", "label"]
-    )
-
-    agg = agg.set_index(["country_code", "label"]).reindex(full_index, fill_value=0).reset_index()
-
-    total_views = agg.groupby("country_code")["views"].transform("sum")
-    agg["percent"] = agg["views"] / total_views * 100
-
-    fig = px.bar(
-        agg,
-        x="country_code",
-        y="percent",
-        color="label",
-        title="Stacked Distribution of Article Pageview Types by Country",
-        barmode="stack",
-        hover_data={
-            "views": True,
-            "percent": ":.1f",
-            "label": True,
-            "country_code": False
-        }
-    )
+    with perf.span("agg:label_shares") as s:
+        agg = store.label_shares(start, end, labels=selected_labels)
+        s.rows = len(agg)
+
+    with perf.span("chart:stacked"):
+        fig = px.bar(
+            agg,
+            x="country_code",
+            y="percent",
+            color="label",
+            title="Stacked Distribution of Article Pageview Types by Country",
+            barmode="stack",
+            hover_data={
+                "views": True,
+                "percent": ":.1f",
+                "label": True,
+                "country_code": False
+            }
+        )
 
-    fig.update_layout(
-        yaxis_title="Percentage of Views (%)",
-        legend_title_text="Article Type",
-        height=500
-    )
+        fig.update_layout(
+            yaxis_title="Percentage of Views (%)",
+            legend_title_text="Article Type",
+            height=500
+        )
 
-    st.plotly_chart(fig, use_container_width=True)
+    with perf.span("render:stacked"):
+        st.plotly_chart(fig, use_container_width=True)
 
     st.markdown("### Monthly Sample Table")
     st.dataframe(grouped.head(20))
@@ -448,7 +559,7 @@ with graphs:
 
 
 
-with summary:
+def show_summary():
     st.header("Summary and Ethical Considerations")
     st.markdown("""
 ### Key Takeaways
@@ -477,7 +588,7 @@ Overall percentage of political pageviews seen in all countries stayed consisten
 ### Aligning Spikes in Political Pageviews to Articles/Events
 """)
 
-    events_df["date"] = events_df["date"].astype(str)
+    events = events_df.assign(date=events_df["date"].dt.strftime("%Y-%m-%d"))
 
     def show_country_events(df, country_name, heading):
         country_df = df[df["country"] == country_name]
@@ -488,32 +599,78 @@ Overall percentage of political pageviews seen in all countries stayed consisten
         )
     
     show_country_events(
-        events_df,
+        events,
         "United States",
         "Political Events Associated With U.S. Pageview Peaks"
     )
 
     show_country_events(
-        events_df,
+        events,
         "United Kingdom",
         "Political Events Associated With UK Pageview Peaks"
     )
 
     show_country_events(
-        events_df,
+        events,
         "India",
         "Political Events Associated With India Pageview Peaks"
     )
 
     show_country_events(
-        events_df,
+        events,
         "Australia",
         "Political Events Associated With Australia Pageview Peaks"
     )
 
     show_country_events(
-        events_df,
+        events,
         "Canada",
         "Political Events Associated With Canadian Pageview Peaks"
     )
 
+
+
+def show_performance():
+    st.header("Performance")
+    st.markdown("Timings of data loads, aggregations, chart builds and images for every rerun of every session in this server process.")
+
+    st.subheader("By operation")
+    st.dataframe(perf.summary(), use_container_width=True)
+
+    runs = perf.records()
+    runs = runs[runs["name"] == "rerun"]
+    st.subheader("Slowest reruns")
+    st.dataframe(
+        runs.sort_values("seconds", ascending=False).head(20)[["session", "run", "seconds", "mem_delta_mb"]],
+        use_container_width=True
+    )
+
+    st.caption(f"Data cache: {store.hits} hits, {store.misses} misses")
+    st.download_button("Download JSON", perf.to_json(), file_name="perf_metrics.json")
+    st.download_button("Download Prometheus text", perf.to_prometheus(), file_name="perf_metrics.prom")
+    if st.button("Write perf_metrics.json / perf_metrics.prom"):
+        perf.dump()
+
+
+
+
+# --- Navigation ---
+# Only the selected section runs on a rerun (st.tabs would run all of them)
+SECTIONS = {
+    "1.0 Introduction": show_introduction,
+    "2.0 Data Summary": show_data_summary,
+    "3.0 New Features": show_features,
+    "4.0 Text Classification": show_classification,
+    "5.0 Hypothesis Testing": show_hypothesis,
+    "6.0 Interactive Visualization": show_graphs,
+    "7.0 Summary": show_summary,
+}
+if perf.enabled():
+    SECTIONS["Performance"] = show_performance
+
+with nav:
+    section = st.radio("Section", list(SECTIONS), horizontal=True, key="section", label_visibility="collapsed")
+with perf.span(f"section:{section}"):
+    SECTIONS[section]()
+
+perf.end_run()
@@ -0,0 +1,165 @@
+# Incremental daily (date, country_code, label) -> views aggregation.
+#
+# Final_CSVs.ipynb rebuilt daily_label_summary from every article row each
+# time. SummaryStore keeps a high-water mark (last aggregated date) per
+# country and only aggregates article rows after it, plus any earlier day that
+# is in the article store but not in the summary (a day re-downloaded after a
+# failure, say). Rows are upserted by
+# (date, country_code), so running an update twice gives the same summary,
+# and relabel() recomputes just the days that contain the given QIDs.
+import json
+import os
+
+import pandas as pd
+
+import storage
+
+WATERMARKS = os.path.join(storage.DATA_DIR, "summary_watermarks.json")
+
+LABELS = ["political", "non-political"]
+NO_QID = "No QID"
+KEYS = ["date", "country_code"]
+
+
+def normalize_labels(labels):
+    """political / non-political stay as they are, everything else becomes "No QID"."""
+    labels = pd.Series(labels, copy=False).astype(object)
+    return labels.where(labels.isin(LABELS), NO_QID)
+
+
+def aggregate(articles):
+    """Sum article views per (date, country_code, label)."""
+    df = pd.DataFrame({
+        "date": pd.to_datetime(articles["date"]),
+        "country_code": articles["country_code"].astype(str),
+        "label": normalize_labels(articles["label"]).to_numpy(),
+        "views": articles["views"].to_numpy(),
+    })
+    return df.groupby(["date", "country_code", "label"], as_index=False)["views"].sum()
+
+
+class SummaryStore:
+    """The daily label summary plus the per-country watermarks it was built up to."""
+
+    def __init__(self, path=storage.SUMMARY, watermarks=WATERMARKS, articles=storage.ARTICLES):
+        self.path = path
+        self.watermarks_path = watermarks
+        self.articles = articles
+        self.watermarks = {}
+        if os.path.exists(watermarks):
+            with open(watermarks, encoding="utf-8") as f:
+                self.watermarks = json.load(f)
+
+    def load(self):
+        if os.path.exists(self.path):
+            return storage.read_table(self.path)
+        return pd.DataFrame(columns=["date", "country_code", "label", "views"])
+
+    def _save(self, summary):
+        summary = summary.sort_values(["date", "country_code", "label"], ignore_index=True)
+        storage.write_table(summary, self.path)
+        tmp = self.watermarks_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.watermarks, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.watermarks_path)
+        return summary
+
+    def upsert(self, summary, new_rows):
+        """Replace every (date, country_code) present in new_rows with new_rows."""
+        if summary.empty:
+            return new_rows
+        summary = summary.astype({"country_code": str, "label": str})
+        replaced = pd.MultiIndex.from_frame(summary[KEYS]).isin(
+            pd.MultiIndex.from_frame(new_rows[KEYS])
+        )
+        return pd.concat([summary[~replaced], new_rows], ignore_index=True)
+
+    def _read_days(self, code, start=None, end=None, days=None):
+        articles = storage.read_articles(
+            self.articles, columns=["date", "country_code", "label", "views"],
+            country_codes=[code], start=start, end=end,
+        )
+        if days is not None:
+            articles = articles[articles["date"].isin(days)]
+        return articles
+
+    def _missing_days(self, summary, code, mark):
+        """Days up to mark that have article rows but no summary rows."""
+        stored = storage.read_articles(self.articles, columns=["date"], country_codes=[code],
+                                       end=mark)["date"].unique()
+        done = summary.loc[summary["country_code"].astype(str) == code, "date"]
+        return pd.DatetimeIndex(stored).difference(pd.DatetimeIndex(done))
+
+    def update(self, country_codes=None):
+        """Aggregate each country's article rows that are not in the summary yet.
+
+        Those are the rows after the country's watermark and any earlier day
+        missing from the summary. Returns the number of new (date,
+        country_code, label) rows.
+        """
+        if country_codes is None:
+            country_codes = storage.article_country_codes(self.articles)
+        return self._update(country_codes, self.load())
+
+    def rebuild(self, country_codes):
+        """Aggregate these countries again from all their article rows.
+
+        Their old summary rows are dropped first, so days that are no longer
+        in the article store leave the summary too.
+        """
+        for code in country_codes:
+            self.watermarks.pop(code, None)
+        summary = self.load()
+        dropped = summary["country_code"].astype(str).isin(list(country_codes))
+        return self._update(country_codes, summary[~dropped], changed=bool(dropped.any()))
+
+    def _update(self, country_codes, summary, changed=False):
+        new_parts = []
+        for code in country_codes:
+            mark = self.watermarks.get(code)
+            if mark is None:
+                parts = [self._read_days(code)]
+            else:
+                mark = pd.Timestamp(mark)
+                parts = [self._read_days(code, start=mark + pd.Timedelta(days=1))]
+                missing = self._missing_days(summary, code, mark)
+                if len(missing):
+                    parts.append(self._read_days(code, missing.min(), missing.max(), missing))
+            articles = pd.concat([p for p in parts if not p.empty] or parts, ignore_index=True)
+            if articles.empty:
+                continue
+            new_parts.append(aggregate(articles))
+            last = articles["date"].max()
+            if mark is not None:
+                last = max(last, mark)
+            self.watermarks[code] = last.strftime("%Y-%m-%d")
+
+        if not new_parts:
+            if changed:
+                self._save(summary)
+            return 0
+        new_rows = pd.concat(new_parts, ignore_index=True)
+        self._save(self.upsert(summary, new_rows))
+        return len(new_rows)
+
+    def relabel(self, qids):
+        """Recompute the summary rows of every (date, country) where one of qids appears.
+
+        Call this after the articles' labels for those QIDs were rewritten.
+        """
+        hits = storage.read_articles(self.articles, columns=["date", "country_code"], qids=qids)
+        if hits.empty:
+            return 0
+        affected = hits.astype({"country_code": str}).drop_duplicates()
+
+        parts = []
+        for code, days in affected.groupby("country_code"):
+            articles = self._read_days(code, days["date"].min(), days["date"].max(), days["date"])
+            parts.append(aggregate(articles))
+
+        new_rows = pd.concat(parts, ignore_index=True)
+        self._save(self.upsert(self.load(), new_rows))
+        return len(affected)
+
+    def export_csv(self, path=storage.SUMMARY_CSV):
+        storage.export_csv(self.load(), path)
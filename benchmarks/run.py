@@ -0,0 +1,425 @@
+# Benchmarks for every stage of the pipeline on synthetic data.
+#
+#   python -m benchmarks.run --days 60 --out bench.json
+#   python -m benchmarks.run --save-baseline baseline.json   # on the commit to compare against
+#   python -m benchmarks.run --baseline baseline.json        # fails on regressions
+#
+# Timings depend on the machine, so no baseline is committed: record one on
+# the same machine before the change being measured.
+#
+# Each stage runs in its own fresh process so its peak RSS is its own.
+# Results (seconds per repeat, latency percentiles, rows/s, peak RSS) are
+# written as JSON.
+import argparse
+import datetime
+import functools
+import http.server
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from queue import Empty
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+
+STAGES = {}
+
+
+def stage(name):
+    def register(fn):
+        STAGES[name] = fn
+        return fn
+    return register
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def current_rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# --- Stages ---
+# Every stage gets the scale settings and a scratch directory and returns a
+# list of (seconds, rows processed) samples, one per repeat or per query.
+
+def _serve_dpdp_days(scale, workdir):
+    """Write the synthetic daily TSVs and serve them; returns (dates, country names, base URL, server)."""
+    tsv_dir = os.path.join(workdir, "dpdp")
+    dates = synthetic.write_dpdp_days(tsv_dir, scale["countries"], scale["days"],
+                                      scale["articles"], scale["rows_per_day"], scale["zipf"])
+    handler = functools.partial(_QuietHandler, directory=tsv_dir)
+    server = http.server.ThreadingHTTPServer(("localhost", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    names = [name for name, _ in synthetic.countries(scale["countries"])]
+    return dates, names, f"http://localhost:{server.server_address[1]}", server
+
+
+@stage("ingest")
+def bench_ingest(scale, workdir):
+    import ingest
+
+    dates, names, base_url, server = _serve_dpdp_days(scale, workdir)
+    samples = []
+    for _ in range(scale["repeat"]):
+        seconds, frames = timed(ingest.ingest, dates, names, base_url=base_url, max_workers=8)
+        samples.append((seconds, sum(len(f) for f in frames.values())))
+    server.shutdown()
+    return samples
+
+
+def _filled_store(scale, workdir):
+    """A RawStore holding every synthetic day, downloaded once (not timed)."""
+    import ingest
+    from raw_cache import RawStore
+
+    dates, names, base_url, server = _serve_dpdp_days(scale, workdir)
+    root = os.path.join(workdir, "raw")
+    ingest.ingest(dates, [], base_url=base_url, max_workers=8, store=RawStore(root))
+    return dates, names, base_url, server, root
+
+
+@stage("ingest_cached")
+def bench_ingest_cached(scale, workdir):
+    # A rerun of the ingest stage: every day is read back from the raw cache
+    import ingest
+    from raw_cache import RawStore
+
+    dates, names, base_url, server, root = _filled_store(scale, workdir)
+    samples = []
+    for _ in range(scale["repeat"]):
+        seconds, frames = timed(ingest.ingest, dates, names, base_url=base_url, max_workers=8,
+                                store=RawStore(root))
+        samples.append((seconds, sum(len(f) for f in frames.values())))
+    server.shutdown()
+    return samples
+
+
+def _bench_top_n(scale, workdir, mode):
+    # One country's top-N from the raw cache, as each heavy_hitters worker process does it
+    from heavy_hitters import country_top_n
+
+    dates, names, _, server, root = _filled_store(scale, workdir)
+    server.shutdown()
+    n = max(scale["articles"] // 20, 1)
+    # Rows are the country's raw rows read, not the rows kept
+    return [(timed(country_top_n, root, dates, names[0], n, mode)[0], len(dates) * scale["rows_per_day"])
+            for _ in range(scale["repeat"])]
+
+
+@stage("heavy_hitters_exact")
+def bench_heavy_hitters_exact(scale, workdir):
+    return _bench_top_n(scale, workdir, "exact")
+
+
+@stage("heavy_hitters_approx")
+def bench_heavy_hitters_approx(scale, workdir):
+    return _bench_top_n(scale, workdir, "approx")
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _model():
+    from classifier import train
+
+    texts = ["president election party vote minister government parliament",
+             "film actor singer album football season series"] * 10
+    return train(texts, ["political", "non-political"] * 10)
+
+
+@stage("classify_batch")
+def bench_classify_batch(scale, workdir):
+    model = _model()
+    texts = synthetic.article_table(1, 1, scale["articles"], scale["articles"])["description"]
+    return [(timed(model.classify, texts)[0], len(texts)) for _ in range(scale["repeat"])]
+
+
+@stage("classify_per_row")
+def bench_classify_per_row(scale, workdir):
+    # The notebook's old one-description-at-a-time loop, on a 1,000 row sample
+    from classifier import classify_article
+
+    model = _model()
+    texts = synthetic.article_table(1, 1, 1000, 1000)["description"]
+    loop = lambda: [classify_article(t, model.vectorizer, model.classifier) for t in texts]
+    return [(timed(loop)[0], len(texts)) for _ in range(scale["repeat"])]
+
+
+@stage("load_csv")
+def bench_load_csv(scale, workdir):
+    # How the dashboard loaded the article tables before the Parquet store
+    import storage
+
+    path = os.path.join(workdir, "articles.csv")
+    storage.export_csv(_articles(scale), path)
+    load = lambda: storage.prepare(pd.read_csv(path))
+    return [(timed(load)[0], len(_articles(scale))) for _ in range(scale["repeat"])]
+
+
+@stage("load_parquet")
+def bench_load_parquet(scale, workdir):
+    import storage
+
+    root = os.path.join(workdir, "articles")
+    storage.write_articles(_articles(scale), root)
+    return [(timed(storage.read_articles, root)[0], len(_articles(scale)))
+            for _ in range(scale["repeat"])]
+
+
+@stage("load_parquet_filtered")
+def bench_load_parquet_filtered(scale, workdir):
+    # One country's political rows and the chart columns: only that country's partitions are read
+    import storage
+
+    articles = _articles(scale)
+    root = os.path.join(workdir, "articles")
+    storage.write_articles(articles, root)
+    code = articles["country_code"].iloc[0]
+    read = lambda: storage.read_articles(root, columns=["date", "article", "views"],
+                                         country_codes=[code], labels=["political"])
+    return [(timed(read)[0], len(articles)) for _ in range(scale["repeat"])]
+
+
+@stage("aggregate")
+def bench_aggregate(scale, workdir):
+    import aggregate
+
+    articles = _articles(scale)
+    return [(timed(aggregate.aggregate, articles)[0], len(articles)) for _ in range(scale["repeat"])]
+
+
+@stage("top_k")
+def bench_top_k(scale, workdir):
+    from topk import stream_top_k
+
+    articles = _articles(scale)
+    chunks = lambda: (articles.iloc[i:i + 100_000] for i in range(0, len(articles), 100_000))
+    return [(timed(stream_top_k, chunks(), 3, ["country", "date"], labels=["political"])[0],
+             len(articles)) for _ in range(scale["repeat"])]
+
+
+@stage("spikes")
+def bench_spikes(scale, workdir):
+    from spikes import detect_spikes
+
+    summary = synthetic.summary_table(scale["countries"], scale["summary_days"])
+    return [(timed(detect_spikes, summary)[0], len(summary)) for _ in range(scale["repeat"])]
+
+
+def _slider_ranges(summary, n, seed=0):
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(summary["date"].min(), summary["date"].max())
+    picks = np.sort(rng.integers(0, len(days), size=(n, 2)), axis=1)
+    return [(days[a].date(), days[b].date()) for a, b in picks]
+
+
+@stage("dashboard_groupby")
+def bench_dashboard_groupby(scale, workdir):
+    # The dashboard's original slider path: mask on .dt.date, then groupby
+    summary = synthetic.summary_table(scale["countries"], scale["summary_days"])
+    samples = []
+    for start, end in _slider_ranges(summary, scale["queries"]):
+        def query():
+            mask = (summary["date"].dt.date >= start) & (summary["date"].dt.date <= end)
+            return summary[mask].groupby(["country_code", "label"])["views"].sum().reset_index()
+        samples.append((timed(query)[0], len(summary)))
+    return samples
+
+
+@stage("dashboard_index")
+def bench_dashboard_index(scale, workdir):
+    # The same queries answered by the prefix-sum index, without the memo cache
+    from range_index import RangeIndex
+
+    summary = synthetic.summary_table(scale["countries"], scale["summary_days"])
+    index = RangeIndex.from_frame(summary)
+    return [(timed(index.label_totals, start, end)[0], len(summary))
+            for start, end in _slider_ranges(summary, scale["queries"])]
+
+
+@stage("dashboard_series")
+def bench_dashboard_series(scale, workdir):
+    # Daily political series for the line chart, downsampled to 1200 points per country
+    from range_index import RangeIndex
+
+    summary = synthetic.summary_table(scale["countries"], scale["summary_days"])
+    index = RangeIndex.from_frame(summary)
+    return [(timed(index.series, "political", start, end, max_points=1200)[0], len(summary))
+            for start, end in _slider_ranges(summary, scale["queries"])]
+
+
+@stage("hypothesis_tests")
+def bench_hypothesis_tests(scale, workdir):
+    # Bootstrap intervals and both permutation tests for one slider range, 10k resamples each
+    import stats
+
+    summary = synthetic.summary_table(scale["countries"], scale["summary_days"])
+    samples = []
+    for start, end in _slider_ranges(summary, 2):
+        shares = stats.daily_shares(summary, start, end)
+        elapsed = timed(stats.bootstrap_ci, shares)[0]
+        elapsed += timed(stats.country_permutation_test, shares)[0]
+        elapsed += timed(stats.window_comparison, shares)[0]
+        samples.append((elapsed, shares.size))
+    return samples
+
+
+_article_cache = {}
+
+
+def _articles(scale):
+    key = (scale["countries"], scale["days"], scale["articles"], scale["rows_per_day"], scale["zipf"])
+    if key not in _article_cache:
+        _article_cache[key] = synthetic.article_table(*key)
+    return _article_cache[key]
+
+
+# --- Running ---
+
+class StageFailed(RuntimeError):
+    pass
+
+
+def _run_stage(name, scale, queue):
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            before = current_rss_mb()
+            samples = STAGES[name](scale, workdir)
+            queue.put({"samples": samples, "rss_before_mb": before, "peak_rss_mb": peak_rss_mb()})
+    except BaseException:
+        queue.put({"error": traceback.format_exc()})
+
+
+def run_stage(name, scale, timeout=None):
+    """Run one stage in a fresh process; raises StageFailed if it errors, dies or times out."""
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_stage, args=(name, scale, queue))
+    proc.start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    raw = None
+    try:
+        while True:
+            try:
+                raw = queue.get(timeout=1)
+                break
+            except Empty:
+                # A child killed outright (OOM, segfault) never reports back
+                if not proc.is_alive():
+                    raise StageFailed(f"process exited with code {proc.exitcode}")
+                if deadline is not None and time.monotonic() > deadline:
+                    raise StageFailed(f"timed out after {timeout:g} s")
+    finally:
+        if raw is None:
+            proc.terminate()
+        proc.join()
+    if "error" in raw:
+        raise StageFailed(raw["error"].rstrip().splitlines()[-1])
+
+    seconds = np.array([s for s, _ in raw["samples"]])
+    rows = np.array([r for _, r in raw["samples"]])
+    return {
+        "runs": len(seconds),
+        "seconds": seconds.round(6).tolist() if len(seconds) <= 20 else None,
+        "p50_ms": float(np.percentile(seconds, 50) * 1000),
+        "p95_ms": float(np.percentile(seconds, 95) * 1000),
+        "p99_ms": float(np.percentile(seconds, 99) * 1000),
+        "rows_per_s": float(rows.sum() / seconds.sum()) if seconds.sum() else None,
+        "peak_rss_mb": raw["peak_rss_mb"],
+        "rss_growth_mb": raw["peak_rss_mb"] - raw["rss_before_mb"],
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Stages whose p50 is more than tolerance (e.g. 0.2 = 20%) slower than the baseline."""
+    regressions = []
+    for name, stats in results["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if old and "p50_ms" in old and "p50_ms" in stats and stats["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+            regressions.append((name, old["p50_ms"], stats["p50_ms"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic DPDP data")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--countries", type=int, default=5)
+    parser.add_argument("--days", type=int, default=30, help="days of raw/article data")
+    parser.add_argument("--summary-days", type=int, default=700, help="days of summary data")
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--rows-per-day", type=int, default=5000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200, help="slider queries for dashboard stages")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", help="also write the results here as the new baseline")
+    parser.add_argument("--stage-timeout", type=float, default=None,
+                        help="fail a stage that runs longer than this many seconds")
+    args = parser.parse_args(argv)
+
+    scale = {
+        "countries": args.countries, "days": args.days, "summary_days": args.summary_days,
+        "articles": args.articles, "rows_per_day": args.rows_per_day, "zipf": args.zipf,
+        "repeat": args.repeat, "queries": args.queries,
+    }
+    results = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "scale": scale,
+        },
+        "stages": {},
+    }
+    failed = []
+    for name in args.stages:
+        try:
+            stats = run_stage(name, scale, args.stage_timeout)
+        except StageFailed as e:
+            failed.append(name)
+            results["stages"][name] = {"error": str(e)}
+            print(f"{name:22s} FAILED: {e}")
+            continue
+        results["stages"][name] = stats
+        print(f"{name:22s} p50 {stats['p50_ms']:10.2f} ms   p95 {stats['p95_ms']:10.2f} ms   "
+              f"{stats['rows_per_s'] or 0:14,.0f} rows/s   peak {stats['peak_rss_mb']:8.1f} MB")
+
+    for path in filter(None, [args.out, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: p50 {old:.2f} ms -> {new:.2f} ms")
+        return 1 if regressions or failed else 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# Synthetic DPDP-shaped data for the benchmarks.
+#
+# Article popularity follows a Zipf distribution so a few articles get most of
+# the views, like the real top-articles tables.
+import os
+
+import numpy as np
+import pandas as pd
+
+COUNTRIES = [
+    ("Australia", "AU"), ("Canada", "CA"), ("India", "IN"),
+    ("United Kingdom", "GB"), ("United States", "US"), ("Germany", "DE"),
+    ("France", "FR"), ("Nigeria", "NG"), ("Philippines", "PH"), ("South Africa", "ZA"),
+]
+LABELS = ["political", "non-political", "No QID"]
+LABEL_WEIGHTS = [0.3, 0.65, 0.05]
+OTHER_PROJECTS = ["de.wikipedia", "fr.wikipedia", "commons.wikimedia"]
+
+
+def countries(n):
+    """The first n (name, code) pairs, making up extra ones past the real list."""
+    real = COUNTRIES[:n]
+    extra = [(f"Country {i}", f"X{i:02d}") for i in range(len(real), n)]
+    return real + extra
+
+
+def zipf_weights(n_articles, s=1.1):
+    weights = 1.0 / np.arange(1, n_articles + 1) ** s
+    return weights / weights.sum()
+
+
+def daily_rows(rng, n_articles, rows_per_day, total_views, s=1.1):
+    """(article ids, views) for one day: which articles show up and how often."""
+    ids = rng.choice(n_articles, size=min(rows_per_day, n_articles), replace=False,
+                     p=zipf_weights(n_articles, s))
+    views = rng.poisson(zipf_weights(n_articles, s)[ids] * total_views) + 1
+    return ids, views
+
+
+def write_dpdp_days(out_dir, n_countries=5, n_days=30, n_articles=20000, rows_per_day=5000,
+                    zipf_s=1.1, other_projects=0.2, start="2023-02-06", seed=0):
+    """Write country_project_page-shaped TSVs ({date}.tsv) and return their dates."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    dates = [str(d.date()) for d in pd.date_range(start, periods=n_days)]
+    titles = np.array([f"Article_{i}" for i in range(n_articles)])
+
+    for date in dates:
+        lines = []
+        for name, code in countries(n_countries):
+            ids, views = daily_rows(rng, n_articles, rows_per_day, rows_per_day * 50, zipf_s)
+            projects = np.where(rng.random(len(ids)) < other_projects,
+                                rng.choice(OTHER_PROJECTS, len(ids)), "en.wikipedia")
+            lines.extend(
+                f"{name}\t{code}\t{p}\t{i}\t{titles[i]}\tQ{i + 1}\t{v}\n"
+                for i, v, p in zip(ids, views, projects)
+            )
+        with open(os.path.join(out_dir, f"{date}.tsv"), "w", encoding="utf-8") as f:
+            f.writelines(lines)
+    return dates
+
+
+def article_table(n_countries=5, n_days=30, n_articles=20000, rows_per_day=5000,
+                  zipf_s=1.1, start="2023-02-06", seed=0):
+    """Labeled article rows shaped like the top_*.csv tables."""
+    rng = np.random.default_rng(seed)
+    labels = rng.choice(LABELS, size=n_articles, p=LABEL_WEIGHTS)
+    parts = []
+    for name, code in countries(n_countries):
+        for date in pd.date_range(start, periods=n_days):
+            ids, views = daily_rows(rng, n_articles, rows_per_day, rows_per_day * 50, zipf_s)
+            parts.append(pd.DataFrame({
+                "date": date, "country": name, "country_code": code,
+                "project": "en.wikipedia", "page_id": ids, "article": [f"Article_{i}" for i in ids],
+                "qid": [f"Q{i + 1}" for i in ids], "views": views,
+                "description": [f"description of article {i}" for i in ids],
+                "label": labels[ids],
+            }))
+    return pd.concat(parts, ignore_index=True)
+
+
+def summary_table(n_countries=5, n_days=700, start="2023-02-06", seed=0):
+    """daily_label_summary-shaped table with weekly seasonality and a few spikes."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(start, periods=n_days)
+    weekly = 1 + 0.1 * np.sin(2 * np.pi * days.dayofweek / 7)
+    parts = []
+    for _, code in countries(n_countries):
+        scale = rng.lognormal(13, 1)
+        for label, share in zip(LABELS, LABEL_WEIGHTS):
+            views = rng.poisson(scale * share * weekly)
+            spikes = rng.choice(n_days, size=max(1, n_days // 100), replace=False)
+            views[spikes] *= rng.integers(2, 6, size=len(spikes))
+            parts.append(pd.DataFrame({"date": days, "country_code": code,
+                                       "label": label, "views": views}))
+    return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,131 @@
+# Political vs non-political Naive Bayes classifier, as a saved artifact.
+#
+# The vectorizer and model trained in Classifier.ipynb are saved together with
+# a version string (a hash of the training data and settings), so relabeling
+# does not need the notebook session. classify_batch() classifies each
+# distinct description once, as a single sparse matrix.
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+from sklearn.naive_bayes import MultinomialNB
+
+MODEL_PATH = os.path.join("models", "political_nb.joblib")
+
+
+class Model:
+    """A fitted vectorizer + classifier pair and the version that identifies it."""
+
+    def __init__(self, vectorizer, classifier, version):
+        self.vectorizer = vectorizer
+        self.classifier = classifier
+        self.version = version
+
+    def classify(self, texts, chunk_size=None, processes=None):
+        return classify_batch(texts, self.vectorizer, self.classifier, chunk_size, processes)
+
+
+def model_version(texts, labels, hashing=False, n_features=None):
+    """Short hash of the training data and settings, stored with every label."""
+    digest = hashlib.sha256()
+    settings = {"hashing": hashing, "n_features": n_features, "sklearn": sklearn.__version__}
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    for text, label in zip(texts, labels):
+        digest.update(f"{label}\t{text}\n".encode())
+    kind = "hashing" if hashing else "countvectorizer"
+    return f"{kind}-nb-{digest.hexdigest()[:12]}"
+
+
+def train(texts, labels, hashing=False, n_features=2 ** 18):
+    """Fit a vectorizer and MultinomialNB on the training texts.
+
+    With hashing=True a HashingVectorizer is used instead of a CountVectorizer:
+    it keeps no vocabulary, so its memory use stays fixed at n_features.
+    """
+    if hashing:
+        # Naive Bayes needs non-negative counts
+        vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None)
+        X = vectorizer.transform(texts)
+    else:
+        vectorizer = CountVectorizer()
+        X = vectorizer.fit_transform(texts)
+
+    classifier = MultinomialNB()
+    classifier.fit(X, labels)
+    version = model_version(texts, labels, hashing, n_features if hashing else None)
+    return Model(vectorizer, classifier, version)
+
+
+def save_model(model, path=MODEL_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    joblib.dump(
+        {"vectorizer": model.vectorizer, "classifier": model.classifier, "version": model.version},
+        path,
+    )
+
+
+def load_model(path=MODEL_PATH):
+    # mmap_mode keeps the model's large arrays on disk until they are used
+    data = joblib.load(path, mmap_mode="r")
+    return Model(data["vectorizer"], data["classifier"], data["version"])
+
+
+# --- Classification ---
+
+def _predict(vectorizer, classifier, texts):
+    return classifier.predict(vectorizer.transform(texts))
+
+
+_worker_model = None
+
+
+def _init_worker(vectorizer, classifier):
+    global _worker_model
+    _worker_model = (vectorizer, classifier)
+
+
+def _predict_in_worker(texts):
+    return _predict(*_worker_model, texts)
+
+
+def classify_batch(texts, vectorizer, classifier, chunk_size=None, processes=None):
+    """Return one label per text.
+
+    Duplicate texts are classified once. The distinct texts are vectorized
+    into one sparse matrix and predicted in one call, or in chunks of
+    chunk_size, spread over a process pool when processes is set (one chunk
+    per process if no chunk_size is given). Missing texts count as "".
+    """
+    # factorize gives missing values code -1, which would pick the last label
+    texts = pd.Series(list(texts), dtype=object).fillna("")
+    if texts.empty:
+        return []
+    codes, distinct = pd.factorize(texts)
+    distinct = list(distinct)
+    if processes and chunk_size is None:
+        chunk_size = -(-len(distinct) // processes)
+
+    if chunk_size is None or chunk_size >= len(distinct):
+        predicted = _predict(vectorizer, classifier, distinct)
+    else:
+        chunks = [distinct[i:i + chunk_size] for i in range(0, len(distinct), chunk_size)]
+        if processes:
+            with ProcessPoolExecutor(processes, initializer=_init_worker,
+                                     initargs=(vectorizer, classifier)) as pool:
+                parts = list(pool.map(_predict_in_worker, chunks))
+        else:
+            parts = [_predict(vectorizer, classifier, chunk) for chunk in chunks]
+        predicted = np.concatenate(parts)
+
+    return np.asarray(predicted)[codes].tolist()
+
+
+def classify_article(text, vectorizer, classifier):
+    """Classify a single description (kept for the notebook)."""
+    return classify_batch([text], vectorizer, classifier)[0]
@@ -0,0 +1,223 @@
+# Data-access layer for the dashboard.
+#
+# A DataStore loads every dataset once per process and memoizes the
+# aggregations the charts ask for, keyed by (date range, countries, labels,
+# granularity). When a source file changes on disk (new mtime *and* new
+# content hash) the dataset is reloaded and every cached result built from it
+# is dropped. Large or memory-mapped files are not hashed: a new mtime or size
+# is enough. RQ_Streamlit.py shares one DataStore across all sessions.
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import drilldown
+import stats
+import storage
+from range_index import RangeIndex
+from spikes import detect_spikes
+
+# name -> (candidate source files, loader); the first file that exists is the one watched
+DATASETS = {
+    "summary": ((storage.SUMMARY, storage.SUMMARY_CSV), storage.load_summary),
+    "spike_articles": ((storage.SPIKE_ARTICLES, storage.SPIKE_ARTICLES_CSV), storage.load_spike_articles),
+    "sample": (("sample.csv",), lambda: pd.read_csv("sample.csv")),
+    # Not a DataFrame: a memory-mapped article store, see drilldown.py
+    "drilldown": ((drilldown.PATH,), drilldown.load),
+}
+# Datasets that are memory-mapped rather than read in, so hashing them would read GBs
+STAT_ONLY = {"drilldown"}
+# Bigger files are versioned by (mtime, size) alone
+HASH_MAX_BYTES = 256 << 20
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _Source:
+    """Remembers the mtime, size and, for small files, the hash of a dataset's source file."""
+
+    def __init__(self, path, hashed=True):
+        self.path = path
+        st = os.stat(path)
+        self.stat = (st.st_mtime_ns, st.st_size)
+        self.sha = file_hash(path) if hashed and st.st_size <= HASH_MAX_BYTES else None
+
+    def changed(self):
+        st = os.stat(self.path)
+        if (st.st_mtime_ns, st.st_size) == self.stat:
+            return False
+        if self.sha is None or st.st_size > HASH_MAX_BYTES:
+            return True
+        # The file was touched; only treat it as changed if the content differs
+        sha = file_hash(self.path)
+        if sha == self.sha:
+            self.stat = (st.st_mtime_ns, st.st_size)
+            return False
+        return True
+
+
+def _existing(paths):
+    for path in paths:
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"none of {paths} exist")
+
+
+def _key_part(values):
+    # Lists from widgets become sorted tuples so the same selection hits the same entry
+    if values is None:
+        return None
+    return tuple(sorted(values))
+
+
+class DataStore:
+    """Loads datasets once and keeps a bounded LRU cache of aggregation results."""
+
+    def __init__(self, max_entries=256, datasets=DATASETS):
+        self.max_entries = max_entries
+        self.datasets = datasets
+        self._frames = {}
+        self._sources = {}
+        self._versions = {}
+        self._results = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    # --- Datasets ---
+
+    def get(self, name):
+        """Return the DataFrame for a dataset, reloading it if its file changed.
+
+        The frame is shared between sessions, so callers must not modify it in place.
+        """
+        with self._lock:
+            source = self._sources.get(name)
+            if source is not None and not source.changed():
+                return self._frames[name]
+
+            paths, loader = self.datasets[name]
+            self._sources[name] = _Source(_existing(paths), hashed=name not in STAT_ONLY)
+            self._frames[name] = loader()
+            self._versions[name] = self._versions.get(name, 0) + 1
+            self._drop_results(name)
+            return self._frames[name]
+
+    def version(self, name):
+        """Load count of a dataset: changes whenever its file changed and was reloaded."""
+        self.get(name)
+        return self._versions[name]
+
+    def _drop_results(self, name):
+        for key in [k for k in self._results if k[0] == name]:
+            del self._results[key]
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._sources.clear()
+            self._results.clear()
+
+    # --- Memoized results ---
+
+    def memoize(self, name, key, compute):
+        """Return compute(frame) for dataset name, cached under key."""
+        frame = self.get(name)
+        full_key = (name, self._versions[name]) + tuple(key)
+        with self._lock:
+            if full_key in self._results:
+                self._results.move_to_end(full_key)
+                self.hits += 1
+                return self._results[full_key]
+
+        result = compute(frame)
+
+        with self._lock:
+            self.misses += 1
+            self._results[full_key] = result
+            self._results.move_to_end(full_key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result
+
+    # --- Aggregations used by the dashboard ---
+
+    def range_index(self):
+        """Prefix-sum index over the summary, rebuilt when the summary changes."""
+        return self.memoize("summary", ("range_index",), RangeIndex.from_frame)
+
+    def label_totals(self, start=None, end=None, countries=None, labels=None):
+        """Total views per (country_code, label) between start and end (inclusive)."""
+        key = ("label_totals", start, end, _key_part(countries), _key_part(labels), None)
+        return self.memoize(
+            "summary", key,
+            lambda df: self.range_index().label_totals(start, end, countries, labels)
+        )
+
+    def label_shares(self, start=None, end=None, countries=None, labels=None):
+        """Views and percent per (country_code, label), every label present for each country."""
+        key = ("label_shares", start, end, _key_part(countries), _key_part(labels), None)
+        return self.memoize(
+            "summary", key,
+            lambda df: self.range_index().label_shares(start, end, countries, labels)
+        )
+
+    def political_series(self, start=None, end=None, countries=None, granularity="Daily",
+                         max_points=None, method="minmax"):
+        """Political views per country over time, by day ("Daily") or month ("Monthly").
+
+        max_points downsamples each country's line, see RangeIndex.series.
+        """
+        key = ("political_series", start, end, _key_part(countries), None,
+               (granularity, max_points, method))
+
+        def compute(df):
+            series = self.range_index().series("political", start, end, countries, granularity,
+                                               max_points, method)
+            return series.rename(columns={"views": "political_views"})
+
+        return self.memoize("summary", key, compute)
+
+    def spikes(self, threshold=3.5, window=28, baseline="rolling"):
+        """Detected political spikes per (date, country_code), see spikes.detect_spikes."""
+        key = ("spikes", None, None, None, None, (threshold, window, baseline))
+        return self.memoize(
+            "summary", key,
+            lambda df: detect_spikes(df, threshold=threshold, window=window, baseline=baseline)
+        )
+
+    # --- Hypothesis tests ---
+    # pool only changes where the resampling runs, not its result, so it is not in the keys
+
+    def share_tests(self, start=None, end=None, countries=None, n_resamples=stats.N_RESAMPLES,
+                    level=0.95, pool=None):
+        """(bootstrap intervals per country, (statistic, p) of the equal-shares test), see stats.py."""
+        key = ("share_tests", start, end, _key_part(countries), None, (n_resamples, level))
+
+        def compute(df):
+            shares = stats.daily_shares(df, start, end, countries)
+            return (stats.bootstrap_ci(shares, n_resamples, level, pool=pool),
+                    stats.country_permutation_test(shares, n_resamples, pool=pool))
+
+        return self.memoize("summary", key, compute)
+
+    def election_windows(self, start=None, end=None, countries=None, windows=stats.ELECTION_WINDOWS,
+                         n_resamples=stats.N_RESAMPLES, level=0.95, pool=None):
+        """Inside vs outside election windows per country, see stats.window_comparison."""
+        windows_key = tuple(sorted((code, tuple(map(tuple, w))) for code, w in windows.items()))
+        key = ("election_windows", start, end, _key_part(countries), None,
+               (windows_key, n_resamples, level))
+
+        def compute(df):
+            shares = stats.daily_shares(df, start, end, countries)
+            return stats.window_comparison(shares, windows, n_resamples, level, pool=pool)
+
+        return self.memoize("summary", key, compute)
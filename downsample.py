@@ -0,0 +1,91 @@
+# Downsampling of time series to what a chart can actually show.
+#
+# A line chart 1200 px wide cannot show more than ~1200 distinct x positions,
+# so sending it every daily point of every country only slows the browser
+# down. Both methods work on a (time x series) array, one column per country,
+# and keep the first and last point of every column:
+#
+# - minmax: split the time axis into equal buckets and keep each bucket's
+#   minimum and maximum. Fully vectorized, and every spike peak survives.
+# - lttb: Largest-Triangle-Three-Buckets, which keeps the one point per bucket
+#   that forms the largest triangle with the previously kept point and the
+#   next bucket's average. Closer to the shape of the line for the same
+#   number of points; the loop is over buckets, every column at once.
+#
+# Both return kept row positions of shape (points, columns), sorted per column.
+import numpy as np
+
+METHODS = ("minmax", "lttb")
+
+
+def minmax_indices(y, n_out):
+    """Positions of each bucket's min and max, about n_out per column."""
+    y = np.asarray(y, dtype=np.float64)
+    n, cols = y.shape
+    n_out = max(n_out, 2)
+    if n <= n_out:
+        return np.repeat(np.arange(n)[:, None], cols, axis=1)
+    if n_out < 4:
+        # No room for a bucket's min and max, only the endpoints
+        return np.repeat(np.array([[0], [n - 1]]), cols, axis=1)
+
+    # The first and last points are kept as they are, the rest is bucketed
+    inner = n - 2
+    size = -(-inner // ((n_out - 2) // 2))
+    n_buckets = -(-inner // size)
+    padded = np.full((n_buckets * size, cols), np.nan)
+    padded[:inner] = y[1:-1]
+    blocks = padded.reshape(n_buckets, size, cols)
+
+    starts = (np.arange(n_buckets) * size + 1)[:, None]
+    lows = starts + np.nanargmin(blocks, axis=1)
+    highs = starts + np.nanargmax(blocks, axis=1)
+    ends = np.zeros((1, cols), dtype=np.int64)
+    idx = np.concatenate([ends, lows, highs, ends + n - 1])
+    return np.sort(idx, axis=0)
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: n_out positions per column of y (shared x)."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n, cols = y.shape
+    n_out = max(n_out, 2)
+    if n <= n_out:
+        return np.repeat(np.arange(n)[:, None], cols, axis=1)
+
+    # n_out - 2 buckets between the first and the last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty((n_out, cols), dtype=np.int64)
+    out[0] = 0
+    out[-1] = n - 1
+    col = np.arange(cols)
+
+    a = out[0]
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[hi:edges[i + 2]].mean()
+            next_y = y[hi:edges[i + 2]].mean(axis=0)
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        ax, ay = x[a], y[a, col]
+        area = np.abs((ax - next_x) * (y[lo:hi] - ay) - (ax - x[lo:hi, None]) * (next_y - ay))
+        a = lo + area.argmax(axis=0)
+        out[i + 1] = a
+    return out
+
+
+def keep_mask(y, n_out, method="minmax", x=None):
+    """Boolean (time x columns) mask of the points to draw."""
+    if method == "minmax":
+        idx = minmax_indices(y, n_out)
+    elif method == "lttb":
+        idx = lttb_indices(np.arange(len(y)) if x is None else x, y, n_out)
+    else:
+        raise ValueError(f"unknown method {method!r}, expected one of {METHODS}")
+
+    mask = np.zeros(np.shape(y), dtype=bool)
+    mask[idx, np.arange(mask.shape[1])] = True
+    return mask
@@ -0,0 +1,124 @@
+# Article-level drill-down store: which articles made up a day's views.
+#
+# Every labeled article row is written to one Arrow IPC file sorted by
+# (country_code, date, views desc), with an index of where each
+# (country_code, date) run starts and how long it is. The file is memory-mapped,
+# so opening it reads only the index and a lookup touches only the pages of
+# that one day. The index is stored in the file's schema metadata, so the file
+# and its index are always replaced together.
+#
+#   python drilldown.py                     # build data/drilldown.arrow from the article store
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import storage
+
+PATH = os.path.join(storage.DATA_DIR, "drilldown.arrow")
+
+SCHEMA = pa.schema([
+    ("country_code", pa.string()),
+    ("date", pa.date32()),
+    ("country", pa.string()),
+    ("article", pa.string()),
+    ("qid", pa.string()),
+    ("views", pa.int64()),
+    ("description", pa.string()),
+    ("label", pa.string()),
+])
+INDEX_SCHEMA = pa.schema([
+    ("country_code", pa.string()),
+    ("date", pa.date32()),
+    ("offset", pa.int64()),
+    ("length", pa.int64()),
+])
+
+
+def _serialize(table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _day_counts(root, code):
+    dates = storage.read_articles(root, columns=["date"], country_codes=[code])["date"]
+    return dates.value_counts().sort_index()
+
+
+def build(path=PATH, root=storage.ARTICLES):
+    """Write the sorted store and its index from the article store, one country at a time."""
+    codes = storage.article_country_codes(root)
+
+    # Pass 1: rows per (country_code, date), which fixes every run's offset up front
+    parts = []
+    for code in codes:
+        counts = _day_counts(root, code)
+        parts.append(pd.DataFrame({"country_code": code, "date": counts.index.date,
+                                   "length": counts.to_numpy()}))
+    index = pd.concat(parts, ignore_index=True) if parts else \
+        pd.DataFrame({"country_code": [], "date": [], "length": []})
+    index["length"] = index["length"].astype(np.int64)
+    index["offset"] = index["length"].cumsum() - index["length"]
+    index = pa.Table.from_pandas(index[INDEX_SCHEMA.names], schema=INDEX_SCHEMA, preserve_index=False)
+
+    # Pass 2: the rows themselves, in the same order
+    schema = SCHEMA.with_metadata({"index": _serialize(index)})
+    tmp = path + ".tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for code in codes:
+            df = storage.read_articles(root, columns=SCHEMA.names, country_codes=[code])
+            df = df.sort_values(["date", "views", "article"], ascending=[True, False, True],
+                                kind="stable")
+            df = df.astype({c: str for c in ["country_code", "country", "label"]})
+            df["date"] = df["date"].dt.date
+            writer.write_table(pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False),
+                               max_chunksize=1 << 16)
+    os.replace(tmp, path)
+    return index.num_rows
+
+
+class Drilldown:
+    """Memory-mapped article store with a (country_code, date) -> rows index."""
+
+    def __init__(self, path=PATH):
+        self.path = path
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        self.table = reader.read_all()
+        index = pa.ipc.open_stream(reader.schema.metadata[b"index"]).read_all().to_pandas()
+        self.index = {
+            (code, str(date)): (offset, length)
+            for code, date, offset, length in index.itertuples(index=False)
+        }
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def day(self, country_code, date):
+        """Every article row of one country and day, most viewed first (Arrow table)."""
+        offset, length = self.index.get((country_code, str(pd.Timestamp(date).date())), (0, 0))
+        return self.table.slice(offset, length)
+
+    def top(self, country_code, date, k=10, labels=("political",)):
+        """The day's k most viewed articles with one of labels, as a DataFrame."""
+        day = self.day(country_code, date)
+        if labels is not None:
+            day = day.filter(pc.is_in(day["label"], value_set=pa.array(list(labels))))
+        return day.slice(0, k).to_pandas()
+
+
+def load(path=PATH):
+    return Drilldown(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the article drill-down store")
+    parser.add_argument("--root", default=storage.ARTICLES, help="article store to read")
+    parser.add_argument("--out", default=PATH)
+    args = parser.parse_args()
+    print(f"{build(args.out, args.root)} (country, date) runs written to {args.out}")
@@ -0,0 +1,173 @@
+# Bounded-memory top-N article selection for ingestion.
+#
+# The original notebook kept every matching row of two years in memory before
+# picking the 10,000 most viewed articles. Here the daily files are read back
+# from the RawStore one day at a time, for one country per worker process:
+#
+# - "exact": pass 1 sums views into an article-id -> int64 array, pass 2 reads
+#   the days again and keeps only the rows of the top-N articles.
+# - "approx": a single pass with a Space-Saving summary of `capacity` counters.
+#   Every count is over-estimated by at most its recorded error, and the error
+#   is at most (total views / capacity).
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import storage
+from ingest import BASE_URL, route_lines, to_frame, ingest
+from raw_cache import RawStore
+
+
+class ArticleCounter:
+    """Exact total views per article, stored as a dense int64 array."""
+
+    def __init__(self):
+        self.ids = {}
+        self.totals = np.zeros(1024, dtype=np.int64)
+
+    def add(self, articles, views):
+        ids = np.fromiter((self.ids.setdefault(a, len(self.ids)) for a in articles),
+                          dtype=np.int64, count=len(articles))
+        if len(self.ids) > len(self.totals):
+            grown = np.zeros(max(len(self.ids), 2 * len(self.totals)), dtype=np.int64)
+            grown[:len(self.totals)] = self.totals
+            self.totals = grown
+        np.add.at(self.totals, ids, views)
+
+    def top(self, n):
+        """The n articles with the most views (ties broken by title)."""
+        titles = np.array(list(self.ids), dtype=object)
+        totals = self.totals[:len(titles)]
+        order = np.lexsort((titles, -totals))[:n]
+        return pd.DataFrame({"article": titles[order], "views": totals[order]})
+
+
+class SpaceSaving:
+    """Weighted Space-Saving summary keeping at most `capacity` articles.
+
+    Updates are applied one day at a time: articles already monitored add their
+    views, new ones enter with the current minimum count (recorded as their
+    error), and only the `capacity` largest counts are kept.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.errors = pd.Series(dtype=np.int64)
+        self.total = 0
+
+    def add(self, articles, views):
+        day = pd.Series(views, index=articles, dtype=np.int64).groupby(level=0).sum()
+        self.total += int(day.sum())
+
+        floor = int(self.counts.min()) if len(self.counts) >= self.capacity else 0
+        known = day.index.isin(self.counts.index)
+
+        counts = self.counts.add(day[known], fill_value=0).astype(np.int64)
+        new = day[~known] + floor
+        counts = pd.concat([counts, new])
+        errors = pd.concat([self.errors, pd.Series(floor, index=new.index, dtype=np.int64)])
+
+        if len(counts) > self.capacity:
+            keep = np.argpartition(-counts.to_numpy(), self.capacity - 1)[:self.capacity]
+            counts = counts.iloc[keep]
+        self.counts = counts
+        self.errors = errors.reindex(counts.index)
+
+    def top(self, n):
+        """The n articles with the largest estimates, with their error bound.
+
+        guaranteed is True when the article is in the true top n whatever the
+        errors are (its lower bound beats the (n+1)-th estimate).
+        """
+        df = pd.DataFrame({"article": self.counts.index, "views": self.counts.to_numpy(),
+                           "error": self.errors.to_numpy()})
+        df = df.sort_values(["views", "article"], ascending=[False, True], kind="stable")
+        cutoff = df["views"].iloc[n] if len(df) > n else 0
+        df = df.head(n).reset_index(drop=True)
+        df["guaranteed"] = df["views"] - df["error"] > cutoff
+        return df
+
+    @property
+    def max_error(self):
+        return self.total / self.capacity
+
+
+def _day_frame(store, date, country, projects):
+    if not store.has(date):
+        return None
+    rows = route_lines(date, store.iter_lines(date), [country], projects)[country]
+    return to_frame(rows) if rows else None
+
+
+def country_top_n(store_root, dates, country, n=10000, mode="exact", capacity=None,
+                  projects=("en.wikipedia",)):
+    """Top-n article rows of one country, read from the RawStore at store_root.
+
+    Returns (rows, stats), where stats has each selected article's total views
+    (plus error and guaranteed columns in approx mode).
+    """
+    store = RawStore(store_root)
+
+    if mode == "exact":
+        counter = ArticleCounter()
+        for date in dates:
+            day = _day_frame(store, date, country, projects)
+            if day is not None:
+                counter.add(day["article"].tolist(), day["views"].to_numpy())
+        stats = counter.top(n)
+
+        survivors = set(stats["article"])
+        kept = []
+        for date in dates:
+            day = _day_frame(store, date, country, projects)
+            if day is not None:
+                kept.append(day[day["article"].isin(survivors)])
+
+    elif mode == "approx":
+        summary = SpaceSaving(capacity or 2 * n)
+        kept = []
+        for date in dates:
+            day = _day_frame(store, date, country, projects)
+            if day is None:
+                continue
+            summary.add(day["article"].to_numpy(), day["views"].to_numpy())
+            # Rows are only kept while their article is monitored; an article that
+            # enters late is missing its earlier days (its error covers those views)
+            kept.append(day[day["article"].isin(summary.counts.index)])
+        stats = summary.top(n)
+        survivors = set(stats["article"])
+        kept = [day[day["article"].isin(survivors)] for day in kept]
+
+    else:
+        raise ValueError(f"unknown mode {mode!r}")
+
+    rows = pd.concat(kept, ignore_index=True) if kept else to_frame([])
+    return rows, stats
+
+
+def top_n_per_country(dates, countries, store_root="raw_dpdp", n=10000, mode="exact",
+                      capacity=None, base_url=BASE_URL, max_workers=8, processes=None):
+    """Download any missing days once, then select each country's top n in parallel.
+
+    Returns {country: (rows, stats)}.
+    """
+    store = RawStore(store_root)
+    ingest(store.missing(dates), [], base_url=base_url, max_workers=max_workers, store=store)
+
+    with ProcessPoolExecutor(processes or len(countries)) as pool:
+        futures = {
+            country: pool.submit(country_top_n, store_root, dates, country, n, mode, capacity)
+            for country in countries
+        }
+        return {country: future.result() for country, future in futures.items()}
+
+
+def write_top(results, csv_files=None):
+    """Write the rows from top_n_per_country into the article store (and optional CSVs)."""
+    for country, (rows, _) in results.items():
+        # The new table replaces all of the country's rows, even months it no longer covers
+        storage.write_articles(rows, replace_countries=True)
+        if csv_files:
+            storage.export_csv(rows, csv_files[country])
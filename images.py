@@ -0,0 +1,66 @@
+# Resized, re-encoded images for the dashboard.
+#
+# The figures in the repo are ~2600 px wide photos of charts but are shown at
+# 1200 px (500 px for the confusion matrix). Given a file path, st.image reads,
+# decodes, resizes and re-encodes it on every rerun. load() does that once:
+# it shrinks the image to the width it is displayed at, re-encodes it and
+# keeps the bytes in memory, keyed by path, modification time and width.
+#
+# The output is an optimized progressive JPEG, or a palette PNG for images
+# with transparency. Those are the formats st.image passes through untouched;
+# WebP would be decoded and re-encoded to JPEG/PNG by Streamlit on every
+# rerun. Streamlit serves image bytes under a URL derived from their hash, so
+# the same bytes on every rerun are sent once and then reused by the browser.
+import io
+import os
+import threading
+from collections import namedtuple
+
+from PIL import Image
+
+QUALITY = 85
+
+Encoded = namedtuple("Encoded", ["data", "mimetype", "width", "height"])
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def encode(path, width, quality=QUALITY):
+    """Resize the image at path to width (never upscaling) and re-encode it."""
+    with Image.open(path) as im:
+        im.load()
+        if im.width > width:
+            height = round(im.height * width / im.width)
+            im = im.resize((width, height), Image.LANCZOS)
+
+        out = io.BytesIO()
+        if im.mode in ("RGBA", "LA", "P"):
+            im.convert("RGBA").quantize(256, method=Image.Quantize.FASTOCTREE).save(out, "PNG", optimize=True)
+            mimetype = "image/png"
+        else:
+            im.convert("RGB").save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+            mimetype = "image/jpeg"
+
+    data = out.getvalue()
+    return Encoded(data, mimetype, im.width, im.height)
+
+
+def load(path, width, quality=QUALITY):
+    """The encoded image for (path, width), re-encoded only when the file changed."""
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns, width, quality)
+    with _lock:
+        cached = _cache.get(key)
+    if cached is None:
+        cached = encode(path, width, quality)
+        with _lock:
+            # Drop older encodings of the same file and width
+            for old in [k for k in _cache if k[0] == key[0] and k[2:] == key[2:]]:
+                del _cache[old]
+            _cache[key] = cached
+    return cached
+
+
+def clear():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,200 @@
+# Reads the daily DPDP (country_project_page) files and routes the rows for
+# every requested country into its own table in a single pass.
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+import storage
+
+log = logging.getLogger(__name__)
+
+BASE_URL = "https://analytics.wikimedia.org/published/datasets/country_project_page"
+USER_AGENT = "Wikipedia Bot, student project"
+
+START_DATE = "2023-02-06"
+END_DATE = "2024-12-31"
+
+COLUMNS = ["date", "country", "country_code", "project", "page_id", "article", "qid", "views"]
+
+# Output file for each country we track
+COUNTRY_FILES = {
+    "Australia": "top_australia.csv",
+    "Canada": "top_canada.csv",
+    "India": "top_india.csv",
+    "United Kingdom": "top_uk.csv",
+    "United States": "top_united_states.csv",
+}
+
+
+def date_range(start=START_DATE, end=END_DATE):
+    """Return every day between start and end (inclusive) as YYYY-MM-DD strings."""
+    return [str(d.date()) for d in pd.date_range(start=start, end=end)]
+
+
+def make_session(max_workers=8):
+    """Create a requests session whose connection pool matches the worker count."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-agent"] = USER_AGENT
+    return session
+
+
+def iter_day_lines(session, date, base_url=BASE_URL, timeout=60):
+    """Stream the lines of one daily file without holding the whole body in memory.
+
+    Raises requests.HTTPError if the file could not be downloaded.
+    """
+    url = f"{base_url}/{date}.tsv"
+    with session.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        response.encoding = "utf-8"
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                yield line
+
+
+def route_lines(date, lines, countries, projects=("en.wikipedia",)):
+    """Split the lines of one day into a dict of country -> list of rows.
+
+    Each row has the date put in front, matching COLUMNS.
+    """
+    countries = set(countries)
+    projects = set(projects)
+    routed = {country: [] for country in countries}
+
+    for line in lines:
+        values = line.rstrip("\r\n").split("\t")
+        if len(values) < 7:
+            continue
+        country = values[0].strip()
+        if country in countries and values[2].strip() in projects:
+            routed[country].append([date] + values[:7])
+
+    return routed
+
+
+def fetch_day(session, date, countries, projects=("en.wikipedia",), base_url=BASE_URL, store=None):
+    """Download one day and route its rows. Returns (date, routed rows, error).
+
+    If a RawStore is given the day is read from disk when it was already
+    downloaded, and saved there when it was not. A stored file that turns out
+    to be truncated or corrupt is dropped and the day downloaded again.
+    """
+    while True:
+        stored = store is not None and store.has(date)
+        try:
+            if store is not None:
+                lines = store.lines(session, date, base_url)
+            else:
+                lines = iter_day_lines(session, date, base_url=base_url)
+            return date, route_lines(date, lines, countries, projects), None
+        except requests.RequestException as e:
+            return date, None, e
+        except (OSError, EOFError, UnicodeDecodeError) as e:
+            # A broken gzip in the store, or a body that is not UTF-8
+            if not stored:
+                return date, None, e
+            log.warning("%s: stored copy is unreadable (%s), downloading it again", date, e)
+            store.discard(date)
+
+
+def to_frame(rows):
+    """Turn a list of routed rows into a DataFrame with typed views and dates."""
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df["views"] = pd.to_numeric(df["views"], errors="coerce").fillna(0).astype(int)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def ingest(dates, countries, projects=("en.wikipedia",), base_url=BASE_URL, max_workers=8, store=None):
+    """Download every date once and return a dict of country -> DataFrame.
+
+    Days are fetched by a bounded pool of worker threads. Days that fail are
+    logged and skipped, like the original notebook loop. With a RawStore
+    only the days missing from it are downloaded and failures are recorded
+    in its manifest so the next run retries them.
+    """
+    rows = {country: [] for country in countries}
+
+    session = make_session(max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(
+            lambda d: fetch_day(session, d, countries, projects, base_url, store),
+            dates,
+        )
+        for date, routed, error in results:
+            if error is not None:
+                log.error("Error: %s for date=%s", error, date)
+                continue
+            for country, country_rows in routed.items():
+                rows[country].extend(country_rows)
+
+    return {country: to_frame(country_rows) for country, country_rows in rows.items()}
+
+
+def top_articles(df, n=10000):
+    """Keep only the rows of the n most viewed articles over the whole period."""
+    info = df.groupby("article", as_index=False)["views"].sum()
+    top = info.sort_values("views", ascending=False).head(n)["article"]
+    return df[df["article"].isin(top)]
+
+
+def write_top_articles(frames, n=10000, csv_files=None):
+    """Write the top-n table for every country into the article store.
+
+    Pass csv_files (e.g. COUNTRY_FILES) to also export each country as CSV.
+    """
+    for country, df in frames.items():
+        top = top_articles(df, n)
+        storage.write_articles(top, replace_countries=True)
+        if csv_files:
+            storage.export_csv(top, csv_files[country])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(format="%(message)s")
+
+    parser = argparse.ArgumentParser(description="Build the top articles tables from the DPDP dataset")
+    parser.add_argument("--start", default=START_DATE)
+    parser.add_argument("--end", default=END_DATE)
+    parser.add_argument("--countries", nargs="+", default=list(COUNTRY_FILES))
+    parser.add_argument("--top", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--csv", action="store_true", help="also export top_*.csv files")
+    parser.add_argument("--mode", choices=["full", "exact", "approx"], default="full",
+                        help="full keeps every row in memory; exact/approx bound memory (see heavy_hitters.py)")
+    parser.add_argument("--capacity", type=int, default=None,
+                        help="Space-Saving counters per country in approx mode (default 2 x top)")
+    parser.add_argument("--cache-dir", default="raw_dpdp",
+                        help="where raw daily files are kept between runs ('' to disable)")
+    args = parser.parse_args()
+
+    csv_files = COUNTRY_FILES if args.csv else None
+
+    if args.mode != "full":
+        import heavy_hitters
+
+        if not args.cache_dir:
+            parser.error("--mode exact/approx reads the days back from --cache-dir")
+        results = heavy_hitters.top_n_per_country(
+            date_range(args.start, args.end), args.countries, store_root=args.cache_dir,
+            n=args.top, mode=args.mode, capacity=args.capacity,
+            base_url=args.base_url, max_workers=args.workers,
+        )
+        heavy_hitters.write_top(results, csv_files=csv_files)
+    else:
+        store = None
+        if args.cache_dir:
+            from raw_cache import RawStore
+            store = RawStore(args.cache_dir)
+
+        frames = ingest(date_range(args.start, args.end), args.countries,
+                        base_url=args.base_url, max_workers=args.workers, store=store)
+        write_top_articles(frames, n=args.top, csv_files=csv_files)
@@ -0,0 +1,68 @@
+# Adds the description and label columns to the article tables.
+#
+# All QIDs are looked up in the shared QidCache in one batch. Only QIDs that
+# are missing (or whose description expired) are fetched from Wikidata, and
+# only new descriptions or ones labeled by another classifier version are
+# classified again.
+from wikidata import FetchFailed, fetch_descriptions, unique_qids
+
+NO_QID = ("N/A", "No QID")
+
+
+def label_qids(qids, cache, classify, classifier_version, ttl=None, fetch=fetch_descriptions):
+    """Make sure every QID has a (description, label) in the cache and return them.
+
+    classify takes a list of descriptions and returns a list of labels.
+    ttl is the age in seconds after which a description is fetched again.
+    If some Wikidata batches failed, everything else is still cached and
+    labeled, then the FetchFailed is raised; the failed QIDs stay uncached so
+    the next run fetches them again.
+    """
+    qids = unique_qids(qids)
+    failure = None
+
+    # Fetch missing or expired descriptions
+    to_fetch = cache.needs_fetch(qids, ttl)
+    if to_fetch:
+        try:
+            fetched = fetch(to_fetch)
+        except FetchFailed as e:
+            fetched, failure = e.descriptions, e
+        entries = []
+        texts = []
+        for qid in to_fetch:
+            if qid not in fetched:
+                # Its batch failed
+                continue
+            text = fetched[qid].get("en")
+            if text is None:
+                entries.append((qid,) + NO_QID)
+            else:
+                texts.append((qid, text))
+        if texts:
+            labels = classify([text for _, text in texts])
+            entries.extend((qid, text, label) for (qid, text), label in zip(texts, labels))
+        cache.put_many(entries, classifier_version)
+
+    # Relabel descriptions that an older classifier labeled
+    to_label = cache.needs_label(qids, classifier_version)
+    if to_label:
+        texts = cache.descriptions(to_label)
+        real = [qid for qid in to_label if texts[qid] != NO_QID[0]]
+        labels = classify([texts[qid] for qid in real]) if real else []
+        cache.relabel_many(list(zip(real, labels)), classifier_version)
+        cache.relabel_many([(qid, NO_QID[1]) for qid in to_label if texts[qid] == NO_QID[0]],
+                           classifier_version)
+
+    if failure is not None:
+        raise failure
+    return cache.get_many(qids)
+
+
+def apply_labels(df, labels):
+    """Set df's description and label columns from a {qid: (description, label)} dict."""
+    descriptions = {qid: desc for qid, (desc, _) in labels.items()}
+    names = {qid: label for qid, (_, label) in labels.items()}
+    df["description"] = df["qid"].map(descriptions).fillna(NO_QID[0])
+    df["label"] = df["qid"].map(names).fillna(NO_QID[1]).astype("category")
+    return df
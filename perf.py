@@ -0,0 +1,201 @@
+# Lightweight timing of the dashboard's hot paths.
+#
+#   with perf.span("load:summary") as s:
+#       df = store.get("summary")
+#       s.rows = len(df)
+#
+# Each span records its duration, rows processed and the change in resident
+# memory, tagged with the session and rerun it ran in. Recording is off by
+# default: RQ_PERF=1 (or perf.enable()) turns it on for the whole process, and
+# start_run(..., enabled=True) for one session's rerun only. When it is off
+# span() returns a shared no-op object, so the instrumentation costs about one
+# function call.
+import json
+import os
+import resource
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+MAX_RECORDS = 20000
+
+_enabled = os.environ.get("RQ_PERF") == "1"
+_records = deque(maxlen=MAX_RECORDS)
+_runs = {}
+_lock = threading.Lock()
+_context = threading.local()
+
+
+def enable(flag=True):
+    """Turn recording on (or off) for every session in the process."""
+    global _enabled
+    _enabled = flag
+
+
+def enabled():
+    """Whether spans are recorded in the current thread's rerun."""
+    return _enabled or getattr(_context, "enabled", False)
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # Not Linux: fall back to the peak RSS (KB on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class _NoSpan:
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self._rss = _rss_mb()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self._start
+        record(self.name, seconds, self.rows, _rss_mb() - self._rss)
+        return False
+
+
+def span(name, rows=None):
+    """Context manager timing the block; set .rows on it to record rows processed."""
+    if not (_enabled or getattr(_context, "enabled", False)):
+        return _NO_SPAN
+    return _Span(name, rows)
+
+
+def record(name, seconds, rows=None, mem_delta_mb=None):
+    with _lock:
+        _records.append({
+            "name": name,
+            "session": getattr(_context, "session", None),
+            "run": getattr(_context, "run", None),
+            "time": time.time(),
+            "seconds": seconds,
+            "rows": rows,
+            "mem_delta_mb": mem_delta_mb,
+        })
+
+
+# --- Reruns ---
+
+def start_run(session, enabled=False):
+    """Mark the start of a script rerun for session (call at the top of the app).
+
+    enabled records this rerun even when recording is off process-wide.
+    """
+    # Streamlit runs each rerun in its session's own thread, so this stays per session
+    _context.enabled = enabled
+    _context.run_start = None
+    if not (_enabled or enabled):
+        return
+    with _lock:
+        _runs[session] = _runs.get(session, 0) + 1
+        run = _runs[session]
+    _context.session = session
+    _context.run = run
+    _context.run_start = time.perf_counter()
+    _context.run_rss = _rss_mb()
+
+
+def end_run():
+    """Record the whole rerun as a "rerun" span (call at the bottom of the app)."""
+    if not enabled() or getattr(_context, "run_start", None) is None:
+        return
+    record("rerun", time.perf_counter() - _context.run_start, None, _rss_mb() - _context.run_rss)
+    _context.run_start = None
+
+
+# --- Reporting ---
+
+def records():
+    with _lock:
+        return pd.DataFrame(list(_records),
+                            columns=["name", "session", "run", "time", "seconds", "rows", "mem_delta_mb"])
+
+
+def clear():
+    with _lock:
+        _records.clear()
+
+
+def summary(df=None):
+    """Count, total and latency percentiles (ms) per span name, slowest first."""
+    df = records() if df is None else df
+    if df.empty:
+        return pd.DataFrame(columns=["name", "count", "total_s", "p50_ms", "p95_ms", "max_ms",
+                                     "rows", "mem_delta_mb"])
+    grouped = df.groupby("name")
+    out = pd.DataFrame({
+        "count": grouped.size(),
+        "total_s": grouped["seconds"].sum(),
+        "p50_ms": grouped["seconds"].median() * 1000,
+        "p95_ms": grouped["seconds"].quantile(0.95) * 1000,
+        "max_ms": grouped["seconds"].max() * 1000,
+        "rows": grouped["rows"].sum(min_count=1),
+        "mem_delta_mb": grouped["mem_delta_mb"].sum(),
+    })
+    return out.sort_values("total_s", ascending=False).reset_index()
+
+
+def to_json():
+    df = records()
+    return json.dumps({
+        "summary": summary(df).to_dict(orient="records"),
+        "records": df.to_dict(orient="records"),
+    }, default=str, indent=1)
+
+
+def to_prometheus(prefix="rq_dashboard"):
+    """Prometheus text exposition of the span durations (summary type) and rows."""
+    df = records()
+    lines = [
+        f"# HELP {prefix}_span_seconds Time spent in instrumented dashboard code.",
+        f"# TYPE {prefix}_span_seconds summary",
+    ]
+    for name, group in df.groupby("name"):
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        seconds = group["seconds"].to_numpy()
+        for q in (0.5, 0.95, 0.99):
+            lines.append(f'{prefix}_span_seconds{{name="{label}",quantile="{q}"}} {np.quantile(seconds, q):.6f}')
+        lines.append(f'{prefix}_span_seconds_sum{{name="{label}"}} {seconds.sum():.6f}')
+        lines.append(f'{prefix}_span_seconds_count{{name="{label}"}} {len(seconds)}')
+
+    lines += [f"# HELP {prefix}_rows_total Rows processed by instrumented dashboard code.",
+              f"# TYPE {prefix}_rows_total counter"]
+    for name, group in df.dropna(subset=["rows"]).groupby("name"):
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'{prefix}_rows_total{{name="{label}"}} {int(group["rows"].sum())}')
+    return "\n".join(lines) + "\n"
+
+
+def dump(directory="."):
+    """Write perf_metrics.json and perf_metrics.prom into directory."""
+    with open(os.path.join(directory, "perf_metrics.json"), "w", encoding="utf-8") as f:
+        f.write(to_json())
+    with open(os.path.join(directory, "perf_metrics.prom"), "w", encoding="utf-8") as f:
+        f.write(to_prometheus())
@@ -0,0 +1,457 @@
+# Runs the whole pipeline, the work of the four notebooks, as one command.
+#
+#   python pipeline.py                      # everything that is out of date
+#   python pipeline.py --countries Australia Canada India "United Kingdom" "United States" Germany
+#   python pipeline.py --dry-run            # only list what would run
+#   python pipeline.py --force label        # rerun label:<country> for every country
+#
+# The stages form a DAG, with one branch per country:
+#
+#   fetch -> top:<country> -> qids:<country> -> label:<country> -> aggregate:<country> -> spikes -> topk
+#                                                    label:<country> -> drilldown
+#
+# Each stage has a fingerprint: a hash of its parameters, the source of the
+# modules it runs, the fingerprints of the stages it depends on and its
+# outside inputs (the raw days it reads, the classifier model). Fingerprints
+# of finished stages are kept in .pipeline/fingerprints.json, and a stage
+# whose fingerprint has not changed is skipped, unless its outputs are gone:
+# then it runs again, and so does everything downstream of it. Adding a
+# country only runs that country's branch plus spikes and topk; a new
+# classifier reruns qids/label/aggregate for every country but no downloads or
+# top-N selection. qids:<country> also reruns once every --ttl-days, to refresh
+# expired descriptions, and after a run where some Wikidata batches failed.
+#
+# Parallel stages (top-N selection, applying labels) run in a process pool.
+# The others run one at a time next to it: they write the shared QID cache,
+# call Wikidata or rewrite the single summary file. While the pool rewrites
+# some countries' article partitions, the stages of other countries read only
+# their own partitions (by the country codes top:<country> found), so they
+# never open a file that is being replaced.
+import argparse
+import functools
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+import classifier
+import drilldown
+import heavy_hitters
+import ingest
+import spikes
+import storage
+import wikidata
+from aggregate import SummaryStore
+from data_access import file_hash
+from labeling import apply_labels, label_qids
+from qid_cache import DEFAULT_PATH as QID_CACHE, QidCache
+from raw_cache import RawStore
+from topk import stream_top_k
+from wikidata import unique_qids
+
+STATE_DIR = ".pipeline"
+FINGERPRINTS = os.path.join(STATE_DIR, "fingerprints.json")
+# Country codes of each country's article rows, written by top:<country>
+COUNTRY_CODES = os.path.join(STATE_DIR, "country_codes")
+
+
+# --- DAG ---
+
+class Stage:
+    """One step of the pipeline: func(*args), run once all deps are done.
+
+    inputs is a callable returning a digest of whatever outside data the
+    stage reads; it is called when the stage is about to run, after its
+    dependencies, so it sees what they produced. outputs is a callable
+    returning False when what the stage wrote is no longer there.
+    """
+
+    def __init__(self, name, func, args=(), deps=(), params=None, code=(), inputs=None,
+                 outputs=None, parallel=False, always=False):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.deps = list(deps)
+        self.params = params or {}
+        self.code = list(code)
+        self.inputs = inputs
+        self.outputs = outputs
+        self.parallel = parallel
+        self.always = always
+
+
+_module_hashes = {}
+
+
+def module_hash(name):
+    if name not in _module_hashes:
+        _module_hashes[name] = file_hash(importlib.util.find_spec(name).origin)
+    return _module_hashes[name]
+
+
+def fingerprint(stage, done):
+    payload = {
+        "params": stage.params,
+        "code": {name: module_hash(name) for name in stage.code},
+        "deps": {dep: done[dep] for dep in stage.deps},
+        "inputs": stage.inputs() if stage.inputs else None,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_fingerprints(path=FINGERPRINTS):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_fingerprints(fingerprints, path=FINGERPRINTS):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(fingerprints, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# Returned by a stage function that has to run again next time, see run()
+PARTIAL = "partial"
+
+
+def _matches(name, patterns):
+    # "label" matches the stage "label" and every "label:<country>"
+    return any(name == p or name.startswith(p + ":") for p in patterns)
+
+
+def run(stages, path=FINGERPRINTS, processes=None, force=(), dry_run=False):
+    """Run the stages whose fingerprint changed, as soon as their dependencies are done.
+
+    A stage whose outputs are missing runs even if its fingerprint matches,
+    and so does every stage downstream of it.
+    A stage function that returns PARTIAL finished but left work undone (some
+    Wikidata batches failed): the stages after it still run, but its
+    fingerprint is not stored, so the next run does it again and then reruns
+    them too.
+    Returns {stage name: "skipped" | "ran" | "partial" | "would run" | "failed" | "blocked"}.
+    """
+    pending = {stage.name: stage for stage in stages}
+    stored = load_fingerprints(path)
+    done = {}
+    status = {}
+    running = {}
+    # Stages rerun for missing outputs (or downstream of one)
+    rebuilt = set()
+
+    with ProcessPoolExecutor(processes) as pool, ThreadPoolExecutor(1) as serial:
+        while pending or running:
+            # Schedule everything that is ready; skipping a stage can make others ready
+            progress = True
+            while progress:
+                progress = False
+                for name, stage in list(pending.items()):
+                    if any(status.get(dep) in ("failed", "blocked") for dep in stage.deps):
+                        status[name] = "blocked"
+                        del pending[name]
+                        progress = True
+                        continue
+                    if not all(dep in done for dep in stage.deps):
+                        continue
+
+                    del pending[name]
+                    progress = True
+                    try:
+                        fp = fingerprint(stage, done)
+                        rebuild = any(dep in rebuilt for dep in stage.deps) or \
+                            (stage.outputs is not None and not stage.outputs())
+                    except OSError:
+                        # An input is missing (e.g. no saved classifier yet)
+                        status[name] = "failed"
+                        print(f"FAILED {name}\n{traceback.format_exc()}", file=sys.stderr)
+                        continue
+                    if rebuild:
+                        rebuilt.add(name)
+                    if not stage.always and stored.get(name) == fp and not rebuild \
+                            and not _matches(name, force):
+                        done[name] = fp
+                        status[name] = "skipped"
+                    elif dry_run:
+                        done[name] = fp
+                        status[name] = "would run"
+                        print(f"would run {name}")
+                    else:
+                        print(f"running {name}")
+                        executor = pool if stage.parallel else serial
+                        running[executor.submit(stage.func, *stage.args)] = (name, fp, time.perf_counter())
+
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, fp, started = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception:
+                    status[name] = "failed"
+                    print(f"FAILED {name}\n{traceback.format_exc()}", file=sys.stderr)
+                    continue
+                if result is PARTIAL:
+                    # A fingerprint the next, complete run cannot match, for this stage or those after it
+                    done[name] = fp + ":partial"
+                    status[name] = "partial"
+                    stored.pop(name, None)
+                    save_fingerprints(stored, path)
+                    print(f"partly done {name} in {time.perf_counter() - started:.1f}s")
+                    continue
+                done[name] = fp
+                status[name] = "ran"
+                stored[name] = fp
+                save_fingerprints(stored, path)
+                print(f"done {name} in {time.perf_counter() - started:.1f}s")
+
+    return status
+
+
+# --- Stage functions ---
+# Module-level so the process pool can pickle them.
+
+def fetch(dates, store_root, base_url, max_workers):
+    """Download the raw days that are not in the RawStore yet."""
+    store = RawStore(store_root)
+    missing = store.missing(dates)
+    if missing:
+        ingest.ingest(missing, [], base_url=base_url, max_workers=max_workers, store=store)
+
+
+def ttl_bucket(ttl):
+    """Changes once every ttl seconds, so qids:<country> refreshes expired descriptions."""
+    return int(time.time() // ttl) if ttl else None
+
+
+def raw_digest(store_root, dates):
+    """Hash of the raw files (their content hash is in the name) behind dates."""
+    manifest = RawStore(store_root).manifest
+    names = [f"{d}:{manifest[d]['file']}" for d in dates if manifest.get(d, {}).get("status") == "ok"]
+    return hashlib.sha256("\n".join(names).encode()).hexdigest()
+
+
+def _codes_path(country):
+    return os.path.join(COUNTRY_CODES, f"{country}.json")
+
+
+def country_codes(country):
+    """Country codes of a country's article partitions, as found by its top:<country> stage."""
+    with open(_codes_path(country), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_country_codes(country, codes):
+    os.makedirs(COUNTRY_CODES, exist_ok=True)
+    tmp = _codes_path(country) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(codes, f)
+    os.replace(tmp, _codes_path(country))
+
+
+def select_top(store_root, dates, country, n, mode, capacity, csv_file=None):
+    """Top-n articles of one country into the article store."""
+    result = heavy_hitters.country_top_n(store_root, dates, country, n, mode, capacity)
+    heavy_hitters.write_top({country: result}, {country: csv_file} if csv_file else None)
+    _save_country_codes(country, sorted(result[0]["country_code"].astype(str).unique()))
+
+
+def fetch_labels(country, model_path, cache_path, ttl, api_url=wikidata.API_URL):
+    """Fetch and classify the descriptions of one country's QIDs into the QID cache.
+
+    Returns PARTIAL if some Wikidata batches failed; those QIDs stay uncached.
+    """
+    model = classifier.load_model(model_path)
+    qids = storage.read_articles(country_codes=country_codes(country), columns=["qid"])["qid"]
+    fetch = functools.partial(wikidata.fetch_descriptions, api_url=api_url)
+    with QidCache(cache_path) as cache:
+        try:
+            label_qids(qids, cache, model.classify, model.version, ttl, fetch=fetch)
+        except wikidata.FetchFailed as e:
+            print(f"{country}: {e}; {len(e.failed)} QIDs are fetched again next run", file=sys.stderr)
+            return PARTIAL
+
+
+def write_labels(country, cache_path):
+    """Rewrite one country's article rows with the cached descriptions and labels."""
+    df = storage.read_articles(country_codes=country_codes(country))
+    if df.empty:
+        return
+    with QidCache(cache_path) as cache:
+        labels = cache.get_many(unique_qids(df["qid"]))
+    storage.write_articles(apply_labels(df, labels))
+
+
+def aggregate_country(country, csv):
+    """Recompute one country's rows of the daily label summary."""
+    summary = SummaryStore()
+    # Its articles were relabeled or reselected, so every day is aggregated again
+    summary.rebuild(country_codes(country))
+    if csv:
+        summary.export_csv()
+
+
+def find_spikes(threshold, window, csv):
+    detected = spikes.detect_spikes(storage.load_summary(), threshold=threshold, window=window)
+    storage.write_table(detected, storage.SPIKE_DAYS)
+    if csv:
+        spike_days = detected[["date", "country_code"]].astype({"country_code": str})
+        codes = list(spike_days["country_code"].unique())
+        if codes:
+            articles = storage.read_articles(labels=["political"], country_codes=codes)
+            articles["country_code"] = articles["country_code"].astype(str)
+            articles = articles.merge(spike_days, on=["date", "country_code"])
+        else:
+            articles = pd.DataFrame(columns=storage.ARTICLE_COLUMNS)
+        storage.export_csv(articles, "spikes.csv")
+
+
+def top_spike_articles(k, csv):
+    spike_days = storage.read_table(storage.SPIKE_DAYS, columns=["date", "country_code"])
+    spike_days["country_code"] = spike_days["country_code"].astype(str)
+    codes = list(spike_days["country_code"].unique())
+    if codes:
+        batches = storage.iter_article_batches(labels=["political"], country_codes=codes)
+        top = stream_top_k(batches, k=k, keys=["country", "date"], only=spike_days)
+    else:
+        top = pd.DataFrame(columns=storage.ARTICLE_COLUMNS)
+    storage.write_table(top, storage.SPIKE_ARTICLES)
+    if csv:
+        storage.export_csv(top, storage.SPIKE_ARTICLES_CSV)
+
+
+# --- Outputs ---
+
+def articles_present(country):
+    try:
+        codes = country_codes(country)
+    except FileNotFoundError:
+        return False
+    return all(os.path.isdir(os.path.join(storage.ARTICLES, f"country_code={code}")) for code in codes)
+
+
+def summary_present(country):
+    if not os.path.exists(storage.SUMMARY) or not articles_present(country):
+        return False
+    stored = storage.read_table(storage.SUMMARY, columns=["country_code"])["country_code"]
+    return set(country_codes(country)) <= set(stored.astype(str))
+
+
+def _exists(*paths):
+    return all(os.path.exists(path) for path in paths)
+
+
+# --- Building the DAG ---
+
+def build(countries, start=ingest.START_DATE, end=ingest.END_DATE, n=10000, mode="exact",
+          capacity=None, store_root="raw_dpdp", base_url=ingest.BASE_URL, max_workers=8,
+          model_path=classifier.MODEL_PATH, cache_path=QID_CACHE, ttl=90 * 24 * 3600,
+          threshold=spikes.THRESHOLD, window=spikes.WINDOW, k=3, csv=False,
+          api_url=wikidata.API_URL):
+    dates = ingest.date_range(start, end)
+    stages = [
+        Stage("fetch", fetch, (dates, store_root, base_url, max_workers), always=True),
+    ]
+
+    aggregates = []
+    for country in countries:
+        csv_file = ingest.COUNTRY_FILES.get(country) if csv else None
+        stages += [
+            Stage(f"top:{country}", select_top,
+                  (store_root, dates, country, n, mode, capacity, csv_file),
+                  deps=["fetch"],
+                  params={"start": start, "end": end, "n": n, "mode": mode, "capacity": capacity,
+                          "csv": csv_file},
+                  code=["heavy_hitters", "ingest", "storage"],
+                  inputs=lambda: raw_digest(store_root, dates),
+                  outputs=functools.partial(articles_present, country),
+                  parallel=True),
+            Stage(f"qids:{country}", fetch_labels, (country, model_path, cache_path, ttl, api_url),
+                  deps=[f"top:{country}"],
+                  params={"ttl": ttl},
+                  code=["labeling", "wikidata", "classifier", "qid_cache"],
+                  inputs=lambda: (file_hash(model_path), ttl_bucket(ttl)),
+                  outputs=functools.partial(_exists, cache_path)),
+            Stage(f"label:{country}", write_labels, (country, cache_path),
+                  deps=[f"qids:{country}"],
+                  code=["labeling", "storage"],
+                  outputs=functools.partial(articles_present, country),
+                  parallel=True),
+            Stage(f"aggregate:{country}", aggregate_country, (country, csv),
+                  deps=[f"label:{country}"],
+                  params={"csv": csv},
+                  code=["aggregate", "storage"],
+                  outputs=functools.partial(summary_present, country)),
+        ]
+        aggregates.append(f"aggregate:{country}")
+
+    stages += [
+        Stage("spikes", find_spikes, (threshold, window, csv),
+              deps=aggregates,
+              params={"threshold": threshold, "window": window, "csv": csv},
+              code=["spikes", "storage"],
+              outputs=functools.partial(_exists, storage.SPIKE_DAYS)),
+        Stage("topk", top_spike_articles, (k, csv),
+              deps=["spikes"],
+              params={"k": k, "csv": csv},
+              code=["topk", "storage"],
+              outputs=functools.partial(_exists, storage.SPIKE_ARTICLES)),
+        Stage("drilldown", drilldown.build,
+              deps=[f"label:{country}" for country in countries],
+              code=["drilldown", "storage"],
+              outputs=functools.partial(_exists, drilldown.PATH)),
+    ]
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the DPDP political pageviews pipeline")
+    parser.add_argument("--start", default=ingest.START_DATE)
+    parser.add_argument("--end", default=ingest.END_DATE)
+    parser.add_argument("--countries", nargs="+", default=list(ingest.COUNTRY_FILES))
+    parser.add_argument("--top", type=int, default=10000)
+    parser.add_argument("--mode", choices=["exact", "approx"], default="exact",
+                        help="top-N selection, see heavy_hitters.py")
+    parser.add_argument("--capacity", type=int, default=None)
+    parser.add_argument("--cache-dir", default="raw_dpdp")
+    parser.add_argument("--base-url", default=ingest.BASE_URL)
+    parser.add_argument("--workers", type=int, default=8, help="download threads")
+    parser.add_argument("--processes", type=int, default=None, help="process pool size (default: all cores)")
+    parser.add_argument("--model", default=classifier.MODEL_PATH)
+    parser.add_argument("--qid-cache", default=QID_CACHE)
+    parser.add_argument("--wikidata-url", default=wikidata.API_URL, help="wbgetentities endpoint")
+    parser.add_argument("--ttl-days", type=float, default=90, help="refetch descriptions older than this")
+    parser.add_argument("--threshold", type=float, default=spikes.THRESHOLD)
+    parser.add_argument("--window", type=int, default=spikes.WINDOW)
+    parser.add_argument("--k", type=int, default=3, help="articles per spike day")
+    parser.add_argument("--csv", action="store_true", help="also export the CSV files")
+    parser.add_argument("--force", nargs="+", default=[], help="rerun these stages (or stage kinds)")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    stages = build(
+        args.countries, args.start, args.end, args.top, args.mode, args.capacity,
+        args.cache_dir, args.base_url, args.workers, args.model, args.qid_cache,
+        args.ttl_days * 24 * 3600, args.threshold, args.window, args.k, args.csv,
+        args.wikidata_url,
+    )
+    status = run(stages, processes=args.processes, force=args.force, dry_run=args.dry_run)
+
+    counts = {}
+    for s in status.values():
+        counts[s] = counts.get(s, 0) + 1
+    print(", ".join(f"{count} {s}" for s, count in sorted(counts.items())))
+    return 1 if "failed" in counts or "partial" in counts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+# Shared QID -> (description, label) cache for every country.
+#
+# Replaces the five qid_cache_*.json files. The cache is a SQLite database in
+# WAL mode: lookups hit the primary key, each batch is written in a single
+# transaction (so an interrupted run never corrupts what was already saved),
+# and every row remembers when its description was fetched and which
+# classifier version produced its label.
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_PATH = "qid_cache.sqlite"
+
+# Old per-country caches, imported once by import_json()
+LEGACY_FILES = [
+    "qid_cache_aus.json",
+    "qid_cache_us.json",
+    "qid_cache_canada.json",
+    "qid_cache_india.json",
+    "qid_cache_uk.json",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS qids (
+    qid TEXT PRIMARY KEY,
+    description TEXT NOT NULL,
+    label TEXT NOT NULL,
+    classifier_version TEXT,
+    fetched_at REAL NOT NULL,
+    labeled_at REAL NOT NULL
+)
+"""
+
+# SQLite limits the number of ? parameters in one statement
+CHUNK = 500
+
+
+def _chunks(items, size=CHUNK):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class QidCache:
+    """SQLite-backed cache of QID descriptions and labels with bulk get/put."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM qids").fetchone()[0]
+
+    def _rows(self, qids, columns):
+        for chunk in _chunks(qids):
+            marks = ",".join("?" * len(chunk))
+            yield from self.conn.execute(
+                f"SELECT qid, {columns} FROM qids WHERE qid IN ({marks})", chunk
+            )
+
+    # --- Bulk API ---
+
+    def get_many(self, qids):
+        """Return {qid: (description, label)} for the QIDs that are cached."""
+        return {qid: (desc, label) for qid, desc, label in self._rows(qids, "description, label")}
+
+    def put_many(self, entries, classifier_version=None, fetched_at=None):
+        """Insert or replace (qid, description, label) entries in one transaction."""
+        now = time.time()
+        fetched_at = now if fetched_at is None else fetched_at
+        rows = [(qid, desc, label, classifier_version, fetched_at, now) for qid, desc, label in entries]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO qids VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def relabel_many(self, entries, classifier_version):
+        """Update only the label of (qid, label) entries, keeping their descriptions."""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE qids SET label = ?, classifier_version = ?, labeled_at = ? WHERE qid = ?",
+                [(label, classifier_version, now, qid) for qid, label in entries],
+            )
+
+    def descriptions(self, qids):
+        """Return {qid: description} for the QIDs that are cached."""
+        return {qid: desc for qid, desc in self._rows(qids, "description")}
+
+    # --- Freshness ---
+
+    def needs_fetch(self, qids, ttl=None):
+        """QIDs that are not cached, or whose description is older than ttl seconds."""
+        cached = {qid: fetched for qid, fetched in self._rows(qids, "fetched_at")}
+        cutoff = None if ttl is None else time.time() - ttl
+        return [
+            qid for qid in qids
+            if qid not in cached or (cutoff is not None and cached[qid] < cutoff)
+        ]
+
+    def needs_label(self, qids, classifier_version):
+        """Cached QIDs whose label came from a different classifier version."""
+        return [
+            qid for qid, version in self._rows(qids, "classifier_version")
+            if version != classifier_version
+        ]
+
+    # --- Migration ---
+
+    def import_json(self, paths=LEGACY_FILES):
+        """Load the old per-country JSON caches; QIDs already in the database are kept."""
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            new = set(data) - set(self.get_many(data))
+            entries = [(qid, data[qid][0], data[qid][1]) for qid in new]
+            # Unknown age and version, so the next TTL or version check refreshes them
+            self.put_many(entries, classifier_version="legacy", fetched_at=0)
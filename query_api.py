@@ -0,0 +1,258 @@
+# Read-only HTTP API over the dashboard's aggregates.
+#
+#   python query_api.py --port 8000
+#
+#   GET /totals?start=2024-01-01&end=2024-06-30&countries=US,GB&labels=political
+#   GET /shares?start=...&end=...&countries=...&labels=...
+#   GET /series?start=...&end=...&countries=...&granularity=daily|monthly&max_points=1200
+#   GET /spikes?threshold=3.5&window=28
+#
+# Every endpoint takes format=json (default) or format=arrow. JSON is
+# pandas' "split" layout, {"columns": [...], "data": [[...], ...]}, readable
+# with pd.read_json(..., orient="split"); arrow is an Arrow IPC stream.
+# Responses are gzipped when the client accepts it and carry an ETag, so a
+# client repeating a request with If-None-Match gets an empty 304. All
+# requests share one DataStore, so the data is loaded once and reloaded when
+# its file changes; the encoded responses are kept in an LRU cache too.
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pyarrow as pa
+
+from data_access import DataStore
+
+JSON = "application/json"
+ARROW = "application/vnd.apache.arrow.stream"
+GZIP_MIN_BYTES = 1024
+
+
+class BadRequest(ValueError):
+    pass
+
+
+# --- Parameters ---
+
+def _one(params, name, default=None):
+    values = params.get(name)
+    return values[-1] if values else default
+
+
+def _list(params, name):
+    """countries=US,GB and countries=US&countries=GB both give ["GB", "US"]."""
+    values = [v for value in params.get(name, []) for v in value.split(",") if v]
+    return sorted(set(values)) or None
+
+
+def _date(params, name):
+    value = _one(params, name)
+    if value is None:
+        return None
+    try:
+        return pd.Timestamp(value).date()
+    except ValueError:
+        raise BadRequest(f"{name} is not a date: {value!r}")
+
+
+def _number(params, name, kind, default, minimum=None, maximum=None):
+    value = _one(params, name)
+    if value is None:
+        return default
+    try:
+        number = kind(value)
+    except ValueError:
+        raise BadRequest(f"{name} is not a number: {value!r}")
+    if not math.isfinite(number):
+        raise BadRequest(f"{name} must be a finite number")
+    if minimum is not None and not number >= minimum:
+        raise BadRequest(f"{name} must be at least {minimum}")
+    if maximum is not None and not number <= maximum:
+        raise BadRequest(f"{name} must be at most {maximum}")
+    return number
+
+
+# --- Endpoints ---
+# Each one turns the query parameters into a hashable key and a function computing the frame.
+
+def totals(store, params):
+    args = (_date(params, "start"), _date(params, "end"), _list(params, "countries"), _list(params, "labels"))
+    return args, lambda: store.label_totals(*args)
+
+
+def shares(store, params):
+    args = (_date(params, "start"), _date(params, "end"), _list(params, "countries"), _list(params, "labels"))
+    return args, lambda: store.label_shares(*args)
+
+
+def series(store, params):
+    granularity = _one(params, "granularity", "daily").capitalize()
+    if granularity not in ("Daily", "Monthly"):
+        raise BadRequest("granularity must be daily or monthly")
+    method = _one(params, "method", "minmax")
+    if method not in ("minmax", "lttb"):
+        raise BadRequest("method must be minmax or lttb")
+    args = (_date(params, "start"), _date(params, "end"), _list(params, "countries"), granularity,
+            _number(params, "max_points", int, None, minimum=1), method)
+    return args, lambda: store.political_series(*args)
+
+
+def spikes(store, params):
+    # A window longer than the summary could never fill; it only costs memory
+    days = len(store.range_index().days)
+    args = (_number(params, "threshold", float, 3.5),
+            _number(params, "window", int, 28, minimum=1, maximum=days))
+    return args, lambda: store.spikes(*args)
+
+
+ENDPOINTS = {"/totals": totals, "/shares": shares, "/series": series, "/spikes": spikes}
+
+
+# --- Encoding ---
+
+def encode(df, fmt):
+    if fmt == "arrow":
+        sink = pa.BufferOutputStream()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), ARROW
+    return df.to_json(orient="split", index=False, date_format="iso").encode(), JSON
+
+
+class Response:
+    """An encoded result: body, its gzipped form (if worth it) and its ETag."""
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self.gzipped = gzip.compress(body, 6) if len(body) >= GZIP_MIN_BYTES else None
+
+
+class QueryService:
+    """Answers endpoint queries from a shared DataStore, caching the encoded responses."""
+
+    def __init__(self, store=None, max_entries=512):
+        self.store = store or DataStore()
+        self.max_entries = max_entries
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def query(self, path, params):
+        endpoint = ENDPOINTS.get(path)
+        if endpoint is None:
+            raise KeyError(path)
+        fmt = _one(params, "format", "json")
+        if fmt not in ("json", "arrow"):
+            raise BadRequest("format must be json or arrow")
+
+        args, compute = endpoint(self.store, params)
+        # The summary version makes a reloaded summary miss every old entry
+        key = (path, fmt, self.store.version("summary")) + tuple(
+            tuple(a) if isinstance(a, list) else a for a in args
+        )
+        with self._lock:
+            if key in self._responses:
+                self._responses.move_to_end(key)
+                self.hits += 1
+                return self._responses[key]
+
+        response = Response(*encode(compute(), fmt))
+        with self._lock:
+            self.misses += 1
+            self._responses[key] = response
+            while len(self._responses) > self.max_entries:
+                self._responses.popitem(last=False)
+        return response
+
+
+# --- HTTP ---
+
+class Handler(BaseHTTPRequestHandler):
+    service = None
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._respond(head=False)
+
+    def do_HEAD(self):
+        self._respond(head=True)
+
+    def _respond(self, head):
+        url = urlparse(self.path)
+        if url.path in ("/", "/health"):
+            self._send(200, json.dumps({"endpoints": sorted(ENDPOINTS)}).encode(), JSON, head=head)
+            return
+        if url.path not in ENDPOINTS:
+            self._error(404, f"unknown endpoint {url.path}", head)
+            return
+        try:
+            response = self.service.query(url.path, parse_qs(url.query))
+        except BadRequest as e:
+            self._error(400, str(e), head)
+            return
+        except Exception as e:
+            self.log_error("%s failed: %r", self.path, e)
+            self._error(500, "internal error", head)
+            return
+
+        headers = {"ETag": response.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if response.etag in self.headers.get("If-None-Match", ""):
+            self._send(304, b"", None, headers, head=True)
+            return
+
+        body = response.body
+        if response.gzipped is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = response.gzipped
+            headers["Content-Encoding"] = "gzip"
+        self._send(200, body, response.content_type, headers, head)
+
+    def _error(self, status, message, head):
+        self._send(status, json.dumps({"error": message}).encode(), JSON, head=head)
+
+    def _send(self, status, body, content_type, headers=None, head=False):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host="127.0.0.1", port=8000, service=None, verbose=False):
+    handler = type("BoundHandler", (Handler,), {"service": service or QueryService()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the pageview aggregates over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, verbose=args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,156 @@
+# Prefix-sum index over the daily (country, label) view totals.
+#
+# The summary table is turned into a dense day x country x label array of
+# views, with cumulative sums along the day axis. The total for any date range
+# is then the difference of two slices, so a slider move costs
+# O(countries x labels) no matter how many days the range covers.
+import numpy as np
+import pandas as pd
+
+from downsample import keep_mask
+
+LABELS = ["No QID", "non-political", "political"]
+
+
+class RangeIndex:
+    """Cumulative (day x country x label) views built from daily_label_summary."""
+
+    def __init__(self, days, countries, labels, views, rows):
+        self.days = days
+        self.countries = countries
+        self.labels = labels
+        self.start = days[0]
+
+        # prefix[i] holds the totals of days[:i]; rows counts the summary rows so
+        # pairs that never appear can be left out, like a groupby would
+        self.prefix = np.zeros((len(days) + 1,) + views.shape[1:], dtype=np.int64)
+        np.cumsum(views, axis=0, out=self.prefix[1:])
+        self.row_prefix = np.zeros((len(days) + 1,) + rows.shape[1:], dtype=np.int64)
+        np.cumsum(rows, axis=0, out=self.row_prefix[1:])
+
+        # Position of the first day of every month, used for monthly rollups
+        month_starts = days.to_period("M").to_timestamp()
+        self.month_pos = np.flatnonzero(np.r_[True, month_starts[1:] != month_starts[:-1]])
+        self.month_ends = (month_starts[self.month_pos] + pd.offsets.MonthEnd(0))
+
+    @classmethod
+    def from_frame(cls, df, labels=LABELS):
+        """Build the index from a (date, country_code, label, views) frame."""
+        dates = pd.to_datetime(df["date"]).to_numpy()
+        days = pd.date_range(dates.min(), dates.max(), freq="D")
+        countries = np.sort(df["country_code"].astype(str).unique())
+        labels = list(labels) + sorted(set(df["label"].astype(str)) - set(labels))
+
+        day_idx = ((dates - days[0].to_datetime64()) // np.timedelta64(1, "D")).astype(np.int64)
+        country_idx = np.searchsorted(countries, df["country_code"].astype(str).to_numpy())
+        label_idx = pd.Index(labels).get_indexer(df["label"].astype(str))
+
+        shape = (len(days), len(countries), len(labels))
+        views = np.zeros(shape, dtype=np.int64)
+        rows = np.zeros(shape, dtype=np.int64)
+        np.add.at(views, (day_idx, country_idx, label_idx), df["views"].to_numpy(dtype=np.int64))
+        np.add.at(rows, (day_idx, country_idx, label_idx), 1)
+        return cls(days, countries, labels, views, rows)
+
+    # --- Positions ---
+
+    def _bounds(self, start=None, end=None):
+        """Return [lo, hi) day positions for an inclusive start/end date."""
+        lo = 0 if start is None else (pd.Timestamp(start) - self.start).days
+        hi = len(self.days) if end is None else (pd.Timestamp(end) - self.start).days + 1
+        lo = min(max(lo, 0), len(self.days))
+        hi = min(max(hi, lo), len(self.days))
+        return lo, hi
+
+    def _select(self, countries=None, labels=None):
+        c = np.arange(len(self.countries)) if countries is None else \
+            np.flatnonzero(np.isin(self.countries, list(countries)))
+        l = np.arange(len(self.labels)) if labels is None else \
+            np.flatnonzero(np.isin(self.labels, list(labels)))
+        return c, l
+
+    # --- Queries ---
+
+    def totals(self, start=None, end=None):
+        """(views, rows) arrays of shape (countries, labels) for the date range."""
+        lo, hi = self._bounds(start, end)
+        return self.prefix[hi] - self.prefix[lo], self.row_prefix[hi] - self.row_prefix[lo]
+
+    def label_totals(self, start=None, end=None, countries=None, labels=None):
+        """Total views per (country_code, label), same shape as the groupby it replaces."""
+        views, rows = self.totals(start, end)
+        c, l = self._select(countries, labels)
+        views, rows = views[np.ix_(c, l)], rows[np.ix_(c, l)]
+
+        ci, li = np.nonzero(rows)
+        return pd.DataFrame({
+            "country_code": self.countries[c][ci],
+            "label": np.asarray(self.labels)[l][li],
+            "views": views[ci, li],
+        })
+
+    def label_shares(self, start=None, end=None, countries=None, labels=None):
+        """Views and percent of each country's total for every (country, label) pair.
+
+        Countries are those with any row for the selected labels; labels that
+        are not selected show up with 0 views, like the stacked bar chart expects.
+        """
+        views, rows = self.totals(start, end)
+        c, l = self._select(countries, labels)
+        keep = np.zeros(len(self.labels), dtype=bool)
+        keep[l] = True
+
+        views = np.where(keep, views[c], 0)
+        present = rows[c][:, keep].sum(axis=1) > 0
+        views = views[present]
+        codes = self.countries[c][present]
+
+        total = views.sum(axis=1, keepdims=True)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            percent = views / total * 100
+
+        n_labels = len(self.labels)
+        return pd.DataFrame({
+            "country_code": np.repeat(codes, n_labels),
+            "label": np.tile(self.labels, len(codes)),
+            "views": views.ravel(),
+            "percent": percent.ravel(),
+        })
+
+    def series(self, label, start=None, end=None, countries=None, granularity="Daily",
+               max_points=None, method="minmax"):
+        """Views of one label per country per day or per month (dated by month end).
+
+        With max_points, each country's series is downsampled to about that many
+        points (see downsample.py), so a narrower range comes back in more detail.
+        """
+        lo, hi = self._bounds(start, end)
+        c, l = self._select(countries, [label])
+        if hi <= lo or len(l) == 0:
+            return pd.DataFrame({"date": pd.Series(dtype="datetime64[ns]"),
+                                 "country_code": pd.Series(dtype=str),
+                                 "views": pd.Series(dtype=np.int64)})
+        l = l[0]
+
+        if granularity == "Daily":
+            edges = np.arange(lo, hi + 1)
+            dates = self.days[lo:hi]
+        else:
+            # Month boundaries inside the range, plus the range ends themselves
+            inner = self.month_pos[(self.month_pos > lo) & (self.month_pos < hi)]
+            edges = np.r_[lo, inner, hi]
+            first = np.searchsorted(self.month_pos, lo, side="right") - 1
+            dates = self.month_ends[first:first + len(edges) - 1]
+
+        views = np.diff(self.prefix[edges][:, c, l], axis=0)
+        rows = np.diff(self.row_prefix[edges][:, c, l], axis=0)
+        present = rows > 0
+        if max_points and len(views) > max_points:
+            present &= keep_mask(views, max_points, method)
+
+        ti, ci = np.nonzero(present)
+        return pd.DataFrame({
+            "date": dates[ti],
+            "country_code": self.countries[c][ci],
+            "views": views[ti, ci],
+        })
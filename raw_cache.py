@@ -0,0 +1,158 @@
+# Local on-disk store for the raw daily DPDP files.
+#
+# Every day is kept as a gzip file named after its date and the sha256 of its
+# content, and manifest.json records which days are done and which failed, so
+# a rerun only downloads what is missing.
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import mmap
+import os
+import threading
+
+import requests
+
+MANIFEST = "manifest.json"
+CHUNK_SIZE = 1 << 16
+
+
+class RawStore:
+    """Compressed, content-addressed store of raw daily TSVs plus a checkpoint manifest."""
+
+    def __init__(self, root="raw_dpdp"):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self.manifest = self._load_manifest()
+
+    # --- Manifest ---
+
+    def _manifest_path(self):
+        return os.path.join(self.root, MANIFEST)
+
+    def _load_manifest(self):
+        path = self._manifest_path()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _save_manifest(self):
+        # Write to a temp file first so an interrupted run never leaves a broken manifest
+        path = self._manifest_path()
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+
+    def _record(self, date, entry):
+        entry["updated"] = datetime.datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self.manifest[date] = entry
+            self._save_manifest()
+
+    def has(self, date):
+        """True if the day was downloaded and its file is still on disk."""
+        entry = self.manifest.get(date)
+        return (
+            entry is not None
+            and entry.get("status") == "ok"
+            and os.path.exists(os.path.join(self.root, entry["file"]))
+        )
+
+    def missing(self, dates):
+        """Return the dates that still need to be downloaded (new or failed)."""
+        return [d for d in dates if not self.has(d)]
+
+    def failed(self):
+        """Return the dates whose last download attempt failed."""
+        return sorted(d for d, e in self.manifest.items() if e.get("status") == "failed")
+
+    def mark_failed(self, date, error):
+        self._record(date, {"status": "failed", "error": str(error)})
+
+    def discard(self, date):
+        """Forget a stored day and delete its file, so the next read downloads it again."""
+        with self._lock:
+            entry = self.manifest.pop(date, None)
+            self._save_manifest()
+        if entry and entry.get("file") and os.path.exists(os.path.join(self.root, entry["file"])):
+            os.remove(os.path.join(self.root, entry["file"]))
+
+    # --- Reading ---
+
+    def path(self, date):
+        return os.path.join(self.root, self.manifest[date]["file"])
+
+    def iter_lines(self, date):
+        """Yield the lines of a stored day.
+
+        The compressed file is memory-mapped and decompressed as it is read, so
+        the raw bytes are never copied into a Python buffer first.
+        """
+        with open(self.path(date), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise EOFError(f"{self.path(date)} is empty")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with gzip.GzipFile(fileobj=mm) as gz:
+                    for line in io.TextIOWrapper(gz, encoding="utf-8"):
+                        line = line.rstrip("\r\n")
+                        if line:
+                            yield line
+
+    # --- Downloading ---
+
+    def download_lines(self, session, date, base_url, timeout=60):
+        """Stream one day from base_url, storing it while yielding its lines."""
+        url = f"{base_url}/{date}.tsv"
+        tmp = os.path.join(self.root, f"{date}.part")
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            with session.get(url, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                with gzip.open(tmp, "wb") as gz:
+                    pending = b""
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        gz.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+
+                        *complete, pending = (pending + chunk).split(b"\n")
+                        for line in complete:
+                            line = line.rstrip(b"\r")
+                            if line:
+                                yield line.decode("utf-8")
+                    if pending.strip():
+                        yield pending.rstrip(b"\r").decode("utf-8")
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        sha = digest.hexdigest()
+        name = f"{date}.{sha[:16]}.tsv.gz"
+        os.replace(tmp, os.path.join(self.root, name))
+
+        # Drop the previous copy of this day if its content changed
+        old = self.manifest.get(date, {}).get("file")
+        if old and old != name and os.path.exists(os.path.join(self.root, old)):
+            os.remove(os.path.join(self.root, old))
+
+        self._record(date, {"status": "ok", "file": name, "sha256": sha, "bytes": size})
+
+    def lines(self, session, date, base_url):
+        """Lines for one day, from disk if we have it, otherwise downloaded and stored."""
+        if self.has(date):
+            return self.iter_lines(date)
+        return self._checked(date, self.download_lines(session, date, base_url))
+
+    def _checked(self, date, lines):
+        try:
+            yield from lines
+        except (requests.RequestException, UnicodeDecodeError) as e:
+            self.mark_failed(date, e)
+            raise
@@ -0,0 +1,133 @@
+# Spike detection on the daily political pageviews of every country.
+#
+# Each day is compared with a baseline built from the days before it (the
+# previous `window` days, or the same weekday over the previous weeks for the
+# "weekday" baseline) using a robust z-score: (views - median) / (1.4826 * MAD).
+# All countries are scored at once as columns of a (day x country) array.
+# SpikeDetector keeps the trailing days it needs, so appending new days only
+# scores those days.
+import warnings
+
+import numpy as np
+import pandas as pd
+
+THRESHOLD = 3.5
+WINDOW = 28
+MIN_PERIODS = 14
+
+# Scales the MAD so it estimates the standard deviation of normal data
+MAD_SCALE = 1.4826
+
+
+def political_wide(summary, label="political"):
+    """Pivot the daily summary into a (day x country_code) table of one label's views."""
+    df = summary[summary["label"] == label]
+    if df.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="date"), columns=pd.Index([], dtype=str),
+                            dtype=float)
+    wide = df.pivot_table(index="date", columns="country_code", values="views",
+                          aggfunc="sum", observed=True)
+    wide.columns = wide.columns.astype(str)
+    days = pd.date_range(wide.index.min(), wide.index.max(), freq="D")
+    return wide.reindex(days).rename_axis("date")
+
+
+def _lags(baseline, window):
+    if baseline == "rolling":
+        return np.arange(1, window + 1)
+    if baseline == "weekday":
+        # Same weekday over the previous `window` weeks
+        return np.arange(1, window + 1) * 7
+    raise ValueError(f"unknown baseline {baseline!r}")
+
+
+def _lag_stack(values, lags):
+    """(day x country x lag) array where [t, c, k] is values[t - lags[k], c] (NaN before day 0)."""
+    n_days = values.shape[0]
+    padded = np.full((lags.max() + n_days,) + values.shape[1:], np.nan)
+    padded[lags.max():] = values
+    idx = np.arange(n_days)[:, None] + lags.max() - lags[None, :]
+    return padded[idx].transpose(0, 2, 1)
+
+
+def score(wide, window=WINDOW, baseline="rolling", min_periods=MIN_PERIODS):
+    """Robust z-score of every (day, country) against the days before it.
+
+    Returns (scores, medians) frames shaped like wide. Days without enough
+    history, or whose history has no spread, get a NaN score.
+    """
+    values = wide.to_numpy(dtype=float)
+    history = _lag_stack(values, _lags(baseline, window))
+
+    enough = np.sum(~np.isnan(history), axis=2) >= min_periods
+    # nanmedian warns about all-NaN slices, which are expected for the first days
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(history, axis=2)
+        mad = np.nanmedian(np.abs(history - median[:, :, None]), axis=2) * MAD_SCALE
+        z = (values - median) / np.where(mad > 0, mad, np.nan)
+
+    z[~enough] = np.nan
+    median[~enough] = np.nan
+    return (pd.DataFrame(z, index=wide.index, columns=wide.columns),
+            pd.DataFrame(median, index=wide.index, columns=wide.columns))
+
+
+def _to_long(wide, scores, medians, threshold):
+    hit = scores.to_numpy() >= threshold
+    ti, ci = np.nonzero(hit)
+    return pd.DataFrame({
+        "date": wide.index[ti],
+        "country_code": wide.columns[ci],
+        "views": wide.to_numpy()[ti, ci].astype(np.int64),
+        "baseline": medians.to_numpy()[ti, ci],
+        "score": scores.to_numpy()[ti, ci],
+    })
+
+
+def detect_spikes(summary, threshold=THRESHOLD, window=WINDOW, baseline="rolling",
+                  min_periods=MIN_PERIODS, label="political"):
+    """Return the (date, country_code) days whose score is at least threshold."""
+    wide = political_wide(summary, label)
+    scores, medians = score(wide, window, baseline, min_periods)
+    return _to_long(wide, scores, medians, threshold)
+
+
+class SpikeDetector:
+    """Scores newly appended days, keeping only the trailing days the baseline needs."""
+
+    def __init__(self, threshold=THRESHOLD, window=WINDOW, baseline="rolling",
+                 min_periods=MIN_PERIODS, label="political"):
+        self.threshold = threshold
+        self.window = window
+        self.baseline = baseline
+        self.min_periods = min_periods
+        self.label = label
+        self.history = None
+
+    def update(self, summary_rows):
+        """Add new summary rows (date, country_code, label, views) and return their spikes.
+
+        Only days after the last day seen are scored; earlier rows are ignored.
+        """
+        new = political_wide(summary_rows, self.label)
+        if self.history is not None and not self.history.empty:
+            last_seen = self.history.index.max()
+            new = new[new.index > last_seen]
+            if new.empty:
+                return _to_long(new, new, new, self.threshold)
+            combined = pd.concat([self.history, new])
+            combined = combined.reindex(
+                pd.date_range(combined.index.min(), combined.index.max(), freq="D")
+            ).rename_axis("date")
+            new_days = combined.index[combined.index > last_seen]
+        else:
+            combined = new
+            new_days = combined.index
+
+        scores, medians = score(combined, self.window, self.baseline, self.min_periods)
+
+        keep = _lags(self.baseline, self.window).max()
+        self.history = combined.iloc[-keep:]
+        return _to_long(combined.loc[new_days], scores.loc[new_days], medians.loc[new_days],
+                        self.threshold)
@@ -0,0 +1,236 @@
+# Bootstrap confidence intervals and permutation tests on political shares.
+#
+# One observation is one country-day: the share of that day's views that went
+# to political articles. With ~700 days per country a plain t-test is
+# significant for any difference at all, so the Hypothesis Testing tab shows
+# effect sizes with bootstrap intervals instead, and permutation tests for:
+#
+# - H0: every country has the same mean daily political share;
+# - per country, H0: the share is the same inside and outside election windows.
+#
+# Resampling is vectorized: each chunk draws a (resamples x days) matrix of
+# indices (or a row-wise permutation) and reduces it with a few NumPy calls,
+# for all countries at once where they share the days. Chunks get independent
+# seeds from one SeedSequence, so the results only depend on the seed, and can
+# be spread over a long-lived process pool (see make_pool); without one they run
+# in-process.
+import multiprocessing
+import os
+import warnings
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+N_RESAMPLES = 10_000
+CHUNK = 1_000
+LABEL = "political"
+
+# Campaign-to-result windows of the elections in the Introduction tab
+ELECTION_WINDOWS = {
+    "AU": [("2023-02-25", "2023-04-08"), ("2024-09-26", "2024-11-09")],
+    "GB": [("2024-05-22", "2024-07-18")],
+    "IN": [("2024-04-19", "2024-06-18")],
+    "US": [("2024-01-15", "2024-06-30"), ("2024-09-01", "2024-11-19")],
+}
+
+
+def daily_shares(summary, start=None, end=None, countries=None, label=LABEL):
+    """(day x country) frame of each day's share of views with label (NaN if no views)."""
+    df = summary
+    dates = pd.to_datetime(df["date"])
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= dates >= pd.Timestamp(start)
+    if end is not None:
+        mask &= dates <= pd.Timestamp(end)
+    if countries is not None:
+        mask &= df["country_code"].astype(str).isin(list(countries))
+    df = pd.DataFrame({
+        "date": dates[mask],
+        "country_code": df.loc[mask, "country_code"].astype(str),
+        "views": df.loc[mask, "views"].astype(np.float64),
+        "hit": (df.loc[mask, "label"].astype(str) == label),
+    })
+
+    totals = df.pivot_table(index="date", columns="country_code", values="views", aggfunc="sum")
+    hits = df[df["hit"]].pivot_table(index="date", columns="country_code", values="views", aggfunc="sum")
+    hits = hits.reindex(index=totals.index, columns=totals.columns).fillna(0)
+    return (hits / totals.where(totals > 0)).sort_index()
+
+
+# --- Resampling ---
+
+def _seeds(seed, n_resamples, chunk):
+    sizes = [min(chunk, n_resamples - i) for i in range(0, n_resamples, chunk)]
+    return list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+
+
+def make_pool(processes=None):
+    """A process pool for the tests, or None on a single core where a pool only adds overhead.
+
+    Workers are spawned rather than forked, so they are safe to start from a
+    multi-threaded server. Create it once and pass it to every call.
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes < 2:
+        return None
+    return ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _run(fn, jobs, pool):
+    """fn(*job) for every job, on pool when one is given."""
+    if pool is not None and len(jobs) > 1:
+        return list(pool.map(fn, *zip(*jobs)))
+    return [fn(*job) for job in jobs]
+
+
+def _nanmean(values, axis):
+    # Countries without any day in a resample give NaN; that is expected
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(values, axis=axis)
+
+
+def _bootstrap_chunk(values, size, seed):
+    rng = np.random.default_rng(seed)
+    n = len(values)
+    idx = rng.integers(0, n, size=(size, n))
+    # How often each day was drawn in each resample, so the means for every
+    # country are two matrix products instead of a (resamples x days x countries) gather
+    counts = np.bincount((np.arange(size)[:, None] * n + idx).ravel(), minlength=size * n)
+    counts = counts.reshape(size, n).astype(np.float64)
+    valid = ~np.isnan(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (counts @ np.where(valid, values, 0)) / (counts @ valid)
+
+
+def bootstrap_means(values, n_resamples=N_RESAMPLES, seed=0, chunk=CHUNK, pool=None):
+    """(n_resamples x columns) bootstrap means of every column of a (days x columns) array.
+
+    Days are resampled together, so columns keep the days they share.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    jobs = [(values, size, s) for size, s in _seeds(seed, n_resamples, chunk)]
+    return np.concatenate(_run(_bootstrap_chunk, jobs, pool))
+
+
+def bootstrap_ci(shares, n_resamples=N_RESAMPLES, level=0.95, seed=0, pool=None):
+    """Mean daily share per country with its percentile bootstrap interval."""
+    means = bootstrap_means(shares.to_numpy(), n_resamples, seed, pool=pool)
+    alpha = (1 - level) / 2
+    low, high = np.nanquantile(means, [alpha, 1 - alpha], axis=0)
+    return pd.DataFrame({
+        "country_code": shares.columns,
+        "days": shares.notna().sum().to_numpy(),
+        "mean_share": _nanmean(shares.to_numpy(), axis=0),
+        "ci_low": low,
+        "ci_high": high,
+    })
+
+
+def _spread(values, starts, counts):
+    """Weighted variance of group means around the grand mean, per row of values."""
+    sums = np.add.reduceat(values, starts, axis=-1)
+    means = sums / counts
+    grand = values.sum(axis=-1, keepdims=True) / counts.sum()
+    return (counts * (means - grand) ** 2).sum(axis=-1) / counts.sum()
+
+
+def _country_perm_chunk(pooled, starts, counts, size, seed):
+    rng = np.random.default_rng(seed)
+    shuffled = rng.permuted(np.broadcast_to(pooled, (size, len(pooled))), axis=1)
+    return _spread(shuffled, starts, counts)
+
+
+def country_permutation_test(shares, n_resamples=N_RESAMPLES, seed=0, pool=None):
+    """Permutation test of H0: every country has the same mean daily share.
+
+    The statistic is the (day-weighted) variance of the country means. Days
+    are reassigned to countries at random, keeping each country's day count.
+    Returns (statistic, p value).
+    """
+    columns = [shares[c].dropna().to_numpy() for c in shares.columns]
+    columns = [c for c in columns if len(c)]
+    if len(columns) < 2:
+        return np.nan, np.nan
+    pooled = np.concatenate(columns)
+    counts = np.array([len(c) for c in columns], dtype=np.float64)
+    starts = np.r_[0, np.cumsum(counts)[:-1]].astype(np.int64)
+
+    observed = _spread(pooled, starts, counts)
+    jobs = [(pooled, starts, counts, size, s) for size, s in _seeds(seed, n_resamples, CHUNK)]
+    permuted = np.concatenate(_run(_country_perm_chunk, jobs, pool))
+    return observed, (1 + np.sum(permuted >= observed)) / (1 + len(permuted))
+
+
+# --- Election windows ---
+
+def window_mask(dates, windows):
+    """True for the dates inside any of the (start, end) windows (inclusive)."""
+    dates = pd.DatetimeIndex(dates)
+    mask = np.zeros(len(dates), dtype=bool)
+    for start, end in windows:
+        mask |= (dates >= pd.Timestamp(start)) & (dates <= pd.Timestamp(end))
+    return mask
+
+
+def _window_chunk(values, n_in, size, seed):
+    rng = np.random.default_rng(seed)
+    n = len(values)
+    # Permutation: relabel which days are "in" the window
+    shuffled = rng.permuted(np.broadcast_to(values, (size, n)), axis=1)
+    perm = shuffled[:, :n_in].mean(axis=1) - shuffled[:, n_in:].mean(axis=1)
+    # Bootstrap: resample inside and outside separately
+    inside = values[:n_in][rng.integers(0, n_in, size=(size, n_in))].mean(axis=1)
+    outside = values[n_in:][rng.integers(0, n - n_in, size=(size, n - n_in))].mean(axis=1)
+    return np.stack([perm, inside - outside], axis=1)
+
+
+def window_comparison(shares, windows=ELECTION_WINDOWS, n_resamples=N_RESAMPLES, level=0.95,
+                      seed=0, pool=None):
+    """Mean share inside vs outside each country's election windows.
+
+    Returns one row per country with windows: both means, their difference
+    with a bootstrap interval, and a two-sided permutation p value.
+    """
+    groups = []
+    jobs = []
+    for code in shares.columns:
+        if not windows.get(code):
+            continue
+        series = shares[code].dropna()
+        mask = window_mask(series.index, windows[code])
+        n_in = int(mask.sum())
+        if n_in == 0 or n_in == len(series):
+            continue
+        # Window days first, so a chunk can split them off at n_in
+        values = np.r_[series.to_numpy()[mask], series.to_numpy()[~mask]]
+        # Seeded by country code, so a country's result does not depend on which others are shown
+        seeds = _seeds([seed, zlib.crc32(code.encode())], n_resamples, CHUNK)
+        groups.append((code, values, n_in, len(seeds)))
+        jobs += [(values, n_in, size, s) for size, s in seeds]
+
+    # All countries' chunks go through one pool
+    draws = _run(_window_chunk, jobs, pool)
+
+    rows = []
+    alpha = (1 - level) / 2
+    for code, values, n_in, n_chunks in groups:
+        country_draws, draws = np.concatenate(draws[:n_chunks]), draws[n_chunks:]
+        observed = values[:n_in].mean() - values[n_in:].mean()
+        low, high = np.quantile(country_draws[:, 1], [alpha, 1 - alpha])
+        rows.append({
+            "country_code": code,
+            "window_days": n_in,
+            "other_days": len(values) - n_in,
+            "window_share": values[:n_in].mean(),
+            "other_share": values[n_in:].mean(),
+            "difference": observed,
+            "ci_low": low,
+            "ci_high": high,
+            "p_value": (1 + np.sum(np.abs(country_draws[:, 0]) >= abs(observed))) / (1 + len(country_draws)),
+        })
+    return pd.DataFrame(rows, columns=["country_code", "window_days", "other_days", "window_share",
+                                       "other_share", "difference", "ci_low", "ci_high", "p_value"])
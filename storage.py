@@ -0,0 +1,276 @@
+# Columnar (Parquet) storage for the article-level and summary tables.
+#
+# The text columns that only take a handful of values (country, label, ...) are
+# stored dictionary-encoded and come back as pandas categoricals, dates are
+# stored as real timestamps and views/page ids as integers. CSV is still
+# available through export_csv() for anyone who needs a plain file.
+import os
+import shutil
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DATA_DIR = "data"
+
+# Article-level rows for every country, partitioned by country_code and month
+ARTICLES = os.path.join(DATA_DIR, "top_articles")
+SUMMARY = os.path.join(DATA_DIR, "daily_label_summary.parquet")
+# Political spikes found in the summary (pipeline.py)
+SPIKE_DAYS = os.path.join(DATA_DIR, "spike_days.parquet")
+SPIKE_ARTICLES = os.path.join(DATA_DIR, "top_articles_on_spike_days.parquet")
+
+# CSV files the tables were originally shipped as
+SUMMARY_CSV = "daily_label_summary.csv"
+SPIKE_ARTICLES_CSV = "top_articles_on_spike_days.csv"
+
+ARTICLE_COLUMNS = ["date", "country", "country_code", "project", "page_id", "article", "qid",
+                   "views", "description", "label"]
+
+CATEGORICAL = ["country", "country_code", "project", "label"]
+INTEGER = ["page_id", "views"]
+PARTITIONS = ["country_code", "month"]
+
+# Schema of the whole article dataset. Partitions written before labeling have
+# no description/label; those columns read back as nulls there instead of the
+# dataset taking its columns from whichever file it happens to open first.
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+ARTICLE_SCHEMA = pa.schema([
+    ("date", pa.timestamp("us")),
+    ("country", _CATEGORY),
+    ("project", _CATEGORY),
+    ("page_id", pa.int64()),
+    ("article", pa.large_string()),
+    ("qid", pa.large_string()),
+    ("views", pa.int64()),
+    ("description", pa.large_string()),
+    ("label", _CATEGORY),
+    ("country_code", pa.string()),
+    ("month", pa.string()),
+])
+
+
+def prepare(df):
+    """Return a copy of df with typed dates, integer counts and categorical text columns."""
+    df = df.copy()
+    if "date" in df:
+        df["date"] = pd.to_datetime(df["date"])
+    for col in INTEGER:
+        if col in df:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int64")
+    for col in CATEGORICAL:
+        if col in df:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def _filter_expression(countries=None, start=None, end=None, labels=None, country_codes=None,
+                       qids=None):
+    """Build a pyarrow filter so only matching row groups/partitions are read."""
+    expr = None
+
+    def add(e):
+        nonlocal expr
+        expr = e if expr is None else expr & e
+
+    if countries is not None:
+        add(ds.field("country").isin(list(countries)))
+    if country_codes is not None:
+        add(ds.field("country_code").isin(list(country_codes)))
+    if labels is not None:
+        add(ds.field("label").isin(list(labels)))
+    if qids is not None:
+        add(ds.field("qid").isin(list(qids)))
+    if start is not None:
+        add(ds.field("date") >= pd.Timestamp(start))
+    if end is not None:
+        add(ds.field("date") <= pd.Timestamp(end))
+    return expr
+
+
+def _to_pandas(table):
+    df = table.to_pandas()
+    # Partition columns come back as categoricals of strings, the rest keep their stored types
+    for col in CATEGORICAL:
+        if col in df and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+# --- Article-level tables ---
+
+def _parquet_files(directory):
+    # Skips the hidden staging folders, like pyarrow's own discovery does
+    found = []
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith((".", "_")))
+        found += [os.path.join(dirpath, f) for f in sorted(filenames)
+                  if f.endswith(".parquet") and not f.startswith((".", "_"))]
+    return found
+
+
+def write_articles(df, root=ARTICLES, append=False, replace_countries=False):
+    """Write article rows into the partitioned dataset.
+
+    Only the (country_code, month) partitions present in df are replaced, so
+    rewriting one country does not touch the others. With append=True the
+    rows are added next to what those partitions already hold (for new days).
+    With replace_countries=True every partition of the countries in df is
+    replaced, including months df no longer has (a rebuilt top-N table).
+
+    The files are written into a hidden staging folder first and then moved
+    into place before the files they replace are removed, so a reader never
+    opens a half-written file.
+    """
+    df = prepare(df)
+    df["month"] = df["date"].dt.strftime("%Y-%m")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    staging = os.path.join(root, f".staging-{uuid.uuid4().hex}")
+    try:
+        pq.write_to_dataset(
+            table,
+            staging,
+            partition_cols=PARTITIONS,
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        )
+        written = set()
+        for dirpath, _, filenames in os.walk(staging):
+            if not filenames:
+                continue
+            target = os.path.join(root, os.path.relpath(dirpath, staging))
+            os.makedirs(target, exist_ok=True)
+            old = [] if append else _parquet_files(target)
+            for name in filenames:
+                os.replace(os.path.join(dirpath, name), os.path.join(target, name))
+                written.add(os.path.join(target, name))
+            for path in old:
+                os.remove(path)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    if replace_countries:
+        for code in df["country_code"].astype(str).unique():
+            _remove_others(os.path.join(root, f"country_code={code}"), written)
+
+
+def _remove_others(directory, keep):
+    """Delete the Parquet files under directory that are not in keep, then empty folders."""
+    for path in _parquet_files(directory):
+        if path not in keep:
+            os.remove(path)
+    for dirpath, dirnames, filenames in os.walk(directory, topdown=False):
+        if dirpath != directory and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+
+
+def articles_dataset(root=ARTICLES, country_codes=None):
+    """The article dataset, or only the partitions of country_codes.
+
+    Limiting it to country_codes means only those folders are listed and
+    opened, so other countries can be rewritten at the same time.
+    """
+    if country_codes is None:
+        return ds.dataset(root, schema=ARTICLE_SCHEMA, format="parquet", partitioning="hive")
+    files = [path for code in country_codes
+             for path in _parquet_files(os.path.join(root, f"country_code={code}"))]
+    return ds.dataset(files, schema=ARTICLE_SCHEMA, format="parquet", partitioning="hive",
+                      partition_base_dir=root)
+
+
+def read_articles(root=ARTICLES, columns=None, countries=None, country_codes=None,
+                  start=None, end=None, labels=None, qids=None):
+    """Read article rows, only loading the requested columns and matching rows.
+
+    Filter by country_codes rather than countries where possible: it reads only
+    those partitions, while countries has to look at every file.
+    """
+    dataset = articles_dataset(root, country_codes)
+    expr = _filter_expression(countries, start, end, labels, country_codes, qids)
+    table = dataset.to_table(columns=columns, filter=expr)
+    return _article_order(_to_pandas(table))
+
+
+def article_country_codes(root=ARTICLES):
+    """Country codes present in the article store, read from the partition folders."""
+    if not os.path.isdir(root):
+        return []
+    prefix = "country_code="
+    return sorted(name[len(prefix):] for name in os.listdir(root) if name.startswith(prefix))
+
+
+def iter_article_batches(root=ARTICLES, columns=None, batch_size=1 << 17, **filters):
+    """Yield article rows as DataFrames of at most batch_size rows."""
+    dataset = articles_dataset(root, filters.get("country_codes"))
+    expr = _filter_expression(**filters)
+    for batch in dataset.to_batches(columns=columns, filter=expr, batch_size=batch_size):
+        if batch.num_rows:
+            yield _article_order(_to_pandas(pa.Table.from_batches([batch])))
+
+
+def _article_order(df):
+    # Partition columns are read back last; put them back where the CSVs had them
+    order = [c for c in ARTICLE_COLUMNS if c in df]
+    return df[order + [c for c in df if c not in order and c != "month"]]
+
+
+# --- Single-file tables ---
+
+def write_table(df, path):
+    """Write df to path, replacing the old file only once the new one is complete."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    try:
+        pq.write_table(pa.Table.from_pandas(prepare(df), preserve_index=False), tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def read_table(path, columns=None, **filters):
+    """Read a Parquet table, with optional column projection and row filters."""
+    expr = _filter_expression(**filters)
+    table = ds.dataset(path, format="parquet").to_table(columns=columns, filter=expr)
+    return _to_pandas(table)
+
+
+def _read(path, csv_path, columns=None, **filters):
+    # Fall back to the shipped CSV if the Parquet copy has not been built yet
+    if os.path.exists(path):
+        return read_table(path, columns=columns, **filters)
+    df = prepare(pd.read_csv(csv_path, usecols=columns))
+    expr = _filter_expression(**filters)
+    if expr is not None:
+        df = _to_pandas(pa.Table.from_pandas(df, preserve_index=False).filter(expr))
+    return df
+
+
+def load_summary(columns=None, **filters):
+    """Load the daily (date, country_code, label) -> views summary."""
+    return _read(SUMMARY, SUMMARY_CSV, columns=columns, **filters)
+
+
+def load_spike_articles(columns=None, **filters):
+    """Load the top political articles on spike days."""
+    return _read(SPIKE_ARTICLES, SPIKE_ARTICLES_CSV, columns=columns, **filters)
+
+
+def export_csv(df, path):
+    """Write df as CSV with dates formatted as YYYY-MM-DD, like the original files."""
+    df = df.copy()
+    if "date" in df:
+        df["date"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
+    df.to_csv(path, index=False)
+
+
+if __name__ == "__main__":
+    # Convert the CSV files in the repo to their Parquet copies
+    from ingest import COUNTRY_FILES
+
+    write_table(pd.read_csv(SUMMARY_CSV), SUMMARY)
+    write_table(pd.read_csv(SPIKE_ARTICLES_CSV), SPIKE_ARTICLES)
+    for csv_file in COUNTRY_FILES.values():
+        if os.path.exists(csv_file):
+            write_articles(pd.read_csv(csv_file))
@@ -0,0 +1,49 @@
+# Local HTTP stand-ins for the DPDP file server and the Wikidata API.
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers GET requests with whatever the test's respond(path) returns."""
+
+    respond = None
+    requests = None
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        status, body, headers = self.respond(self.path)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def serve():
+    """serve(respond) starts a server and returns (base URL, list of requested paths).
+
+    respond(path) returns (status, body bytes, headers dict).
+    """
+    servers = []
+
+    def start(respond):
+        requests = []
+        handler = type("Handler", (StubHandler,), {"respond": staticmethod(respond),
+                                                   "requests": requests})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}", requests
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,74 @@
+import os
+
+import pandas as pd
+import pytest
+
+import storage
+from aggregate import SummaryStore, aggregate
+
+
+def _articles(days):
+    return pd.DataFrame([
+        {"date": f"2024-01-{day:02d}", "country": country, "country_code": code,
+         "project": "en.wikipedia", "page_id": i, "article": f"A{i}", "qid": f"Q{i}",
+         "views": 10 * day + i, "description": "d", "label": label}
+        for day in days
+        for country, code in (("Australia", "AU"), ("Canada", "CA"))
+        for i, label in enumerate(["political", "non-political", "No QID"])
+    ])
+
+
+@pytest.fixture
+def store(tmp_path):
+    root = str(tmp_path / "articles")
+    return SummaryStore(str(tmp_path / "summary.parquet"), str(tmp_path / "watermarks.json"), root)
+
+
+def _expected(root):
+    expected = aggregate(storage.read_articles(root))
+    return expected.sort_values(["date", "country_code", "label"], ignore_index=True)
+
+
+def test_update_only_adds_new_days(store):
+    storage.write_articles(_articles(range(1, 11)), store.articles)
+    assert store.update() == 60
+    storage.write_articles(_articles(range(11, 13)), store.articles, append=True)
+
+    assert store.update() == 12
+    assert store.update() == 0
+    assert store.watermarks == {"AU": "2024-01-12", "CA": "2024-01-12"}
+
+
+def test_day_written_behind_the_watermark_is_aggregated(store):
+    storage.write_articles(_articles([d for d in range(1, 21) if d != 12]), store.articles)
+    store.update()
+
+    # Day 12 failed to download and was fetched again on a later run
+    storage.write_articles(_articles([12]), store.articles, append=True)
+
+    assert store.update() == 6
+    summary = store.load().astype({"country_code": str, "label": str})
+    expected = _expected(store.articles)
+    assert len(summary) == 120
+    assert summary["views"].tolist() == expected["views"].tolist()
+    assert store.watermarks["AU"] == "2024-01-20"
+
+
+def test_a_failed_write_keeps_the_old_summary(store, monkeypatch):
+    storage.write_articles(_articles([1, 2]), store.articles)
+    store.update()
+    before = store.load()
+
+    def broken(table, where, *args, **kwargs):
+        with open(where, "wb") as f:
+            f.write(b"PAR1 half a file")
+        raise OSError("disk full")
+
+    storage.write_articles(_articles([3]), store.articles, append=True)
+    monkeypatch.setattr(storage.pq, "write_table", broken)
+    with pytest.raises(OSError):
+        store.update()
+
+    monkeypatch.undo()
+    pd.testing.assert_frame_equal(store.load(), before)
+    assert not os.path.exists(store.path + ".tmp")
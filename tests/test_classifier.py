@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import classifier
+
+TRAINING = [
+    ("Prime Minister of Australia", "political"),
+    ("member of the House of Representatives", "political"),
+    ("American politician and lawyer", "political"),
+    ("political party in Canada", "political"),
+    ("general election held in India", "political"),
+    ("Australian rules football club", "non-political"),
+    ("American singer and songwriter", "non-political"),
+    ("city in New South Wales", "non-political"),
+    ("2023 science fiction film", "non-political"),
+    ("species of bird", "non-political"),
+    ("village in England", "non-political"),
+]
+
+
+@pytest.fixture(scope="module")
+def model():
+    texts, labels = zip(*TRAINING)
+    return classifier.train(list(texts), list(labels))
+
+
+def test_missing_texts_are_classified_as_empty(model):
+    texts = [None, "species of fish", "", np.nan, "Canadian politician"]
+
+    labels = model.classify(texts)
+
+    assert model.classify([""]) == ["non-political"]
+    assert labels == ["non-political", "non-political", "non-political", "non-political", "political"]
+
+
+@pytest.mark.parametrize("chunk_size,processes", [(None, 2), (3, None), (3, 2), (1000, 2)])
+def test_chunks_and_processes_give_the_same_labels(model, chunk_size, processes):
+    texts = [text for text, _ in TRAINING] * 3 + ["Indian politician", "rock band", None]
+
+    assert model.classify(texts, chunk_size, processes) == model.classify(texts)
+
+
+def test_processes_alone_split_the_work(model, monkeypatch):
+    chunks = []
+    monkeypatch.setattr(classifier, "_predict_in_worker",
+                        lambda texts: chunks.append(texts) or np.array(["x"] * len(texts)))
+
+    class Inline:
+        def __init__(self, processes, initializer, initargs):
+            initializer(*initargs)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+        def map(self, fn, items):
+            return map(fn, items)
+
+    monkeypatch.setattr(classifier, "ProcessPoolExecutor", Inline)
+    texts = [f"text {i}" for i in range(10)]
+
+    assert model.classify(texts, processes=3) == ["x"] * 10
+    assert [len(c) for c in chunks] == [4, 4, 2]
+
+
+def test_saved_model_gives_the_same_labels(model, tmp_path):
+    path = str(tmp_path / "model.joblib")
+    classifier.save_model(model, path)
+    loaded = classifier.load_model(path)
+
+    texts = [text for text, _ in TRAINING]
+    assert loaded.version == model.version
+    assert loaded.classify(texts) == model.classify(texts)
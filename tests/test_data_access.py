@@ -0,0 +1,57 @@
+import os
+
+import pandas as pd
+import pytest
+
+import data_access
+from data_access import DataStore
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / "data.csv")
+    pd.DataFrame({"views": [1, 2, 3]}).to_csv(path, index=False)
+    return path
+
+
+def _touch(path, content=None):
+    if content is not None:
+        with open(path, "w") as f:
+            f.write(content)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def _store(path, name="data"):
+    loads = []
+    store = DataStore(datasets={name: ((path,), lambda: loads.append(1) or pd.read_csv(path))})
+    return store, loads
+
+
+def test_touched_file_with_the_same_content_is_not_reloaded(source):
+    store, loads = _store(source)
+    store.get("data")
+
+    _touch(source)
+    store.get("data")
+    assert len(loads) == 1
+
+    _touch(source, "views\n4\n5\n6\n")
+    assert store.get("data")["views"].tolist() == [4, 5, 6]
+    assert len(loads) == 2
+
+
+@pytest.mark.parametrize("name,limit", [("drilldown", data_access.HASH_MAX_BYTES), ("data", 10)])
+def test_large_or_mapped_files_are_versioned_by_stat(source, monkeypatch, name, limit):
+    monkeypatch.setattr(data_access, "HASH_MAX_BYTES", limit)
+    monkeypatch.setattr(data_access, "file_hash", lambda path: pytest.fail("file was hashed"))
+    store, loads = _store(source, name)
+    store.get(name)
+
+    store.get(name)
+    assert len(loads) == 1
+    # Without a hash, a new mtime alone means a new version
+    _touch(source)
+    store.get(name)
+    assert len(loads) == 2
+    assert store.version(name) == 2
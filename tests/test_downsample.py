@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from downsample import keep_mask, lttb_indices, minmax_indices
+
+N = 1000
+SPIKES = {0: [137, 620], 1: [401], 2: [999]}
+
+
+@pytest.fixture(scope="module")
+def series():
+    """Three noisy daily series with a few tall single-day spikes."""
+    rng = np.random.default_rng(16)
+    y = rng.normal(100, 5, (N, 3)).cumsum(axis=0) / 10 + 1000
+    for col, days in SPIKES.items():
+        y[days, col] += 5000
+    y[250, 1] -= 5000   # and one dip
+    return y
+
+
+def _indices(method, y, n_out):
+    if method == "minmax":
+        return minmax_indices(y, n_out)
+    return lttb_indices(np.arange(len(y)), y, n_out)
+
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+@pytest.mark.parametrize("n_out", [1, 2, 3, 4, 5, 10, 101, 400])
+def test_endpoints_kept_and_budget_respected(series, method, n_out):
+    idx = _indices(method, series, n_out)
+
+    assert idx.shape[1] == series.shape[1]
+    assert len(idx) <= max(n_out, 2)
+    assert (idx[0] == 0).all() and (idx[-1] == N - 1).all()
+    assert (np.diff(idx, axis=0) >= 0).all()
+
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+@pytest.mark.parametrize("n_out", [20, 100])
+def test_peaks_survive(series, method, n_out):
+    mask = keep_mask(series, n_out, method)
+
+    for col, days in SPIKES.items():
+        assert mask[days, col].all()
+    assert mask[250, 1]
+    # minmax keeps every column's extremes whatever the budget
+    if method == "minmax":
+        assert mask[series.argmax(axis=0), [0, 1, 2]].all()
+        assert mask[series.argmin(axis=0), [0, 1, 2]].all()
+
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+def test_short_series_are_kept_whole(series, method):
+    assert keep_mask(series[:50], 50, method).all()
+    assert keep_mask(series[:1], 1, method).all()
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingest
+from heavy_hitters import SpaceSaving, country_top_n
+from raw_cache import RawStore
+
+DATES = ingest.date_range("2024-01-01", "2024-01-15")
+COUNTRIES = ["Australia", "Canada"]
+
+
+def _day_tsv(rng):
+    lines = []
+    for country, code in [("Australia", "AU"), ("Canada", "CA")]:
+        for i in range(300):
+            # Most articles only show up on some days; views fall off like a Zipf law
+            if rng.random() < 0.6:
+                views = int(rng.integers(1, 10**6) / (i + 1))
+                lines.append(f"{country}\t{code}\ten.wikipedia\t{i}\tArticle_{i}\tQ{i}\t{views}")
+        lines.append(f"{country}\t{code}\tde.wikipedia\t0\tArticle_0\tQ0\t999999999")
+    return "\n".join(lines).encode()
+
+
+@pytest.fixture(scope="module")
+def days():
+    rng = np.random.default_rng(11)
+    return {date: _day_tsv(rng) for date in DATES}
+
+
+@pytest.fixture
+def store_root(serve, days, tmp_path):
+    base_url, _ = serve(lambda path: (200, days[os.path.basename(path).removesuffix(".tsv")], {}))
+    frames = ingest.ingest(DATES, COUNTRIES, base_url=base_url, max_workers=2,
+                           store=RawStore(str(tmp_path)))
+    return str(tmp_path), frames
+
+
+def _rows(df):
+    return df.sort_values(["date", "article"], ignore_index=True)[ingest.COLUMNS]
+
+
+@pytest.mark.parametrize("n", [1, 25, 150])
+@pytest.mark.parametrize("mode", ["exact", "approx"])
+def test_exact_selection_matches_top_articles(store_root, mode, n):
+    root, frames = store_root
+    full = frames["Canada"]
+    totals = full.groupby("article")["views"].sum().sort_values(ascending=False)
+    assert totals.iloc[n - 1] != totals.iloc[n], "the cut-off must not fall on a tie"
+
+    # approx with a counter for every article is exact too
+    rows, stats = country_top_n(root, DATES, "Canada", n, mode, capacity=10_000)
+
+    pd.testing.assert_frame_equal(_rows(rows), _rows(ingest.top_articles(full, n)))
+    assert stats["views"].tolist() == totals.head(n).tolist()
+    if mode == "approx":
+        assert (stats["error"] == 0).all() and stats["guaranteed"].all()
+
+
+def test_space_saving_bounds_hold_with_few_counters(store_root):
+    _, frames = store_root
+    full = frames["Australia"]
+    totals = full.groupby("article")["views"].sum()
+
+    summary = SpaceSaving(40)
+    for _, day in full.groupby("date"):
+        summary.add(day["article"].to_numpy(), day["views"].to_numpy())
+    top = summary.top(10)
+
+    true = totals.reindex(top["article"]).to_numpy()
+    assert (top["views"] - top["error"] <= true).all()
+    assert (true <= top["views"]).all()
+    assert (top["error"] <= summary.max_error).all()
+    # Articles marked guaranteed really are in the top 10
+    exact = set(totals.sort_values(ascending=False).head(10).index)
+    assert set(top.loc[top["guaranteed"], "article"]) <= exact
@@ -0,0 +1,143 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import ingest
+from raw_cache import RawStore
+
+DAYS = {
+    "2024-01-01": (
+        "Australia\tAU\ten.wikipedia\t1\tAnthony_Albanese\tQ1\t120\n"
+        "Australia\tAU\tde.wikipedia\t2\tSydney\tQ2\t40\n"
+        "Canada\tCA\ten.wikipedia\t3\tJustin_Trudeau\tQ3\t300\n"
+        "Germany\tDE\ten.wikipedia\t4\tBerlin\tQ4\t90\n"
+        "not a row\n"
+    ),
+    "2024-01-02": (
+        "Australia\tAU\ten.wikipedia\t1\tAnthony_Albanese\tQ1\t80\n"
+        "Canada\tCA\ten.wikipedia\t5\tOttawa\tQ5\t15\n"
+    ),
+    "2024-01-03": (
+        "Canada\tCA\ten.wikipedia\t3\tJustin_Trudeau\tQ3\t200\n"
+    ),
+}
+DATES = sorted(DAYS)
+# Raw bodies to serve instead of DAYS, for days a test wants to break
+BODIES = {}
+
+
+@pytest.fixture
+def dpdp(serve):
+    """A DPDP file server for DAYS; dates in `available` can be switched off to get 404s."""
+    available = set(DAYS)
+
+    def respond(path):
+        date = os.path.basename(path).removesuffix(".tsv")
+        if date not in available:
+            return 404, b"not found", {}
+        return 200, BODIES.get(date, DAYS[date].encode()), {"Content-Type": "text/tab-separated-values"}
+
+    base_url, requests = serve(respond)
+    return base_url, requests, available
+
+
+def _requested_dates(requests):
+    return sorted(os.path.basename(path).removesuffix(".tsv") for path in requests)
+
+
+def test_route_lines_keeps_requested_countries_and_projects():
+    routed = ingest.route_lines("2024-01-01", DAYS["2024-01-01"].splitlines(), ["Australia", "Canada"])
+
+    assert routed["Australia"] == [
+        ["2024-01-01", "Australia", "AU", "en.wikipedia", "1", "Anthony_Albanese", "Q1", "120"],
+    ]
+    assert [row[5] for row in routed["Canada"]] == ["Justin_Trudeau"]
+    assert "Germany" not in routed
+
+
+def test_ingest_routes_every_day_into_its_country(dpdp):
+    base_url, requests, _ = dpdp
+
+    frames = ingest.ingest(DATES, ["Australia", "Canada"], base_url=base_url, max_workers=2)
+
+    assert _requested_dates(requests) == DATES
+    australia = frames["Australia"].sort_values("date", ignore_index=True)
+    assert list(australia.columns) == ingest.COLUMNS
+    assert australia["views"].tolist() == [120, 80]
+    assert australia["date"].tolist() == [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-02")]
+    assert sorted(frames["Canada"]["article"]) == ["Justin_Trudeau", "Justin_Trudeau", "Ottawa"]
+
+
+def test_missing_day_is_recorded_as_failed(dpdp, tmp_path):
+    base_url, _, available = dpdp
+    available.discard("2024-01-02")
+    store = RawStore(str(tmp_path))
+
+    frames = ingest.ingest(DATES, ["Canada"], base_url=base_url, max_workers=2, store=store)
+
+    assert store.failed() == ["2024-01-02"]
+    assert "404" in store.manifest["2024-01-02"]["error"]
+    assert store.missing(DATES) == ["2024-01-02"]
+    assert sorted(frames["Canada"]["views"]) == [200, 300]
+    # The manifest on disk says the same, so the next run knows
+    with open(tmp_path / "manifest.json", encoding="utf-8") as f:
+        assert json.load(f)["2024-01-02"]["status"] == "failed"
+
+
+def test_resume_only_downloads_missing_days(dpdp, tmp_path):
+    base_url, requests, available = dpdp
+    available.discard("2024-01-03")
+    ingest.ingest(DATES, ["Canada"], base_url=base_url, max_workers=2, store=RawStore(str(tmp_path)))
+
+    available.add("2024-01-03")
+    requests.clear()
+    store = RawStore(str(tmp_path))
+    frames = ingest.ingest(DATES, ["Canada"], base_url=base_url, max_workers=2, store=store)
+
+    assert _requested_dates(requests) == ["2024-01-03"]
+    assert store.missing(DATES) == []
+    assert store.failed() == []
+    # The other days were read back from the store
+    assert sorted(frames["Canada"]["views"]) == [15, 200, 300]
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: data[: len(data) // 2],
+    lambda data: b"not gzip at all",
+    lambda data: b"",
+], ids=["truncated", "not-gzip", "empty"])
+def test_corrupt_stored_day_is_downloaded_again(dpdp, tmp_path, damage):
+    base_url, requests, _ = dpdp
+    store = RawStore(str(tmp_path))
+    ingest.ingest(DATES, ["Canada"], base_url=base_url, max_workers=2, store=store)
+    path = store.path("2024-01-03")
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(damage(data))
+
+    requests.clear()
+    store = RawStore(str(tmp_path))
+    frames = ingest.ingest(DATES, ["Canada"], base_url=base_url, max_workers=2, store=store)
+
+    assert _requested_dates(requests) == ["2024-01-03"]
+    assert sorted(frames["Canada"]["views"]) == [15, 200, 300]
+    assert store.missing(DATES) == []
+    assert [name for name in os.listdir(tmp_path) if name.startswith("2024-01-03")] == [
+        store.manifest["2024-01-03"]["file"]
+    ]
+
+
+def test_invalid_utf8_day_is_recorded_as_failed(dpdp, tmp_path, monkeypatch, caplog):
+    base_url, _, _ = dpdp
+    monkeypatch.setitem(BODIES, "2024-01-02", b"Canada\tCA\ten.wikipedia\t5\tOtt\xe4wa\tQ5\t15\n")
+    store = RawStore(str(tmp_path))
+
+    frames = ingest.ingest(DATES, ["Canada"], base_url=base_url, max_workers=2, store=store)
+
+    assert store.failed() == ["2024-01-02"]
+    assert not any(name.endswith(".part") for name in os.listdir(tmp_path))
+    assert sorted(frames["Canada"]["views"]) == [200, 300]
+    assert "date=2024-01-02" in caplog.text
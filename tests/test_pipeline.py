@@ -0,0 +1,136 @@
+import json
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+import classifier
+import pipeline
+import storage
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # The pipeline's data/ and .pipeline/ paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _summary(days, codes=("AU", "CA")):
+    dates = pd.date_range("2024-01-01", periods=days)
+    return pd.DataFrame([
+        {"date": date, "country_code": code, "label": label, "views": views}
+        for date in dates for code in codes
+        for label, views in (("political", 30), ("non-political", 70))
+    ])
+
+
+def test_find_spikes_with_no_spikes_still_exports_csv(workdir):
+    # Fewer days than the window: nothing can be scored
+    storage.write_table(_summary(5), storage.SUMMARY)
+
+    pipeline.find_spikes(threshold=3.5, window=14, csv=True)
+
+    assert storage.read_table(storage.SPIKE_DAYS).empty
+    exported = pd.read_csv(workdir / "spikes.csv")
+    assert exported.empty
+    assert list(exported.columns) == storage.ARTICLE_COLUMNS
+
+
+def _day_tsv(date):
+    day = int(date[-2:])
+    return "".join(
+        f"{country}\t{code}\ten.wikipedia\t{i}\tArticle_{i}\tQ{i}\t{100 * day + i}\n"
+        for country, code, ids in (("Australia", "AU", range(1, 4)), ("Canada", "CA", range(4, 7)))
+        for i in ids
+    ).encode()
+
+
+@pytest.fixture
+def dpdp(serve):
+    base_url, _ = serve(lambda path: (200, _day_tsv(path.rsplit("/", 1)[-1][:-4]), {}))
+    return base_url
+
+
+def _select_and_aggregate(base_url, start, end):
+    dates = pipeline.ingest.date_range(start, end)
+    pipeline.fetch(dates, "raw", base_url, 2)
+    for country in ("Australia", "Canada"):
+        pipeline.select_top("raw", dates, country, 10, "exact", None)
+        pipeline.aggregate_country(country, csv=False)
+
+
+def test_narrowed_rerun_drops_the_old_days(workdir, dpdp):
+    _select_and_aggregate(dpdp, "2024-01-30", "2024-02-02")
+    _select_and_aggregate(dpdp, "2024-02-01", "2024-02-02")
+
+    articles = storage.read_articles()
+    assert sorted(articles["date"].dt.strftime("%Y-%m-%d").unique()) == ["2024-02-01", "2024-02-02"]
+    assert not (workdir / storage.ARTICLES / "country_code=AU" / "month=2024-01").exists()
+    summary = storage.load_summary()
+    assert sorted(summary["date"].dt.strftime("%Y-%m-%d").unique()) == ["2024-02-01", "2024-02-02"]
+    assert summary["views"].sum() == articles["views"].sum()
+
+
+@pytest.fixture
+def wikidata_stub(serve):
+    """wbgetentities stub; QIDs in `broken` get a 403."""
+    broken = set()
+
+    def respond(path):
+        ids = parse_qs(urlparse(path).query)["ids"][0].split("|")
+        if broken & set(ids):
+            return 403, b"forbidden", {}
+        entities = {qid: {"id": qid, "descriptions": {"en": {"value": f"election party {qid}"}}}
+                    for qid in ids}
+        return 200, json.dumps({"entities": entities}).encode(), {}
+
+    api_url, calls = serve(respond)
+    return api_url, calls, broken
+
+
+def _stages(dpdp, api_url, ttl=3600):
+    return pipeline.build(["Australia", "Canada"], "2024-02-01", "2024-02-03", n=10,
+                          store_root="raw", base_url=dpdp, max_workers=2, cache_path="qids.sqlite",
+                          ttl=ttl, window=3, api_url=api_url)
+
+
+@pytest.fixture
+def model(workdir):
+    texts = ["election party vote", "film album singer"] * 3
+    classifier.save_model(classifier.train(texts, ["political", "non-political"] * 3))
+
+
+def test_failed_wikidata_batch_reruns_qids(workdir, dpdp, wikidata_stub, model):
+    api_url, _, broken = wikidata_stub
+    broken.add("Q1")
+
+    status = pipeline.run(_stages(dpdp, api_url), processes=1)
+    assert status["qids:Australia"] == "partial"
+    assert status["topk"] == "ran"
+    first = storage.read_articles()
+    assert set(first.loc[first["qid"] == "Q1", "label"]) == {"No QID"}
+
+    broken.clear()
+    status = pipeline.run(_stages(dpdp, api_url), processes=1)
+    assert status["qids:Australia"] == "ran"
+    assert status["label:Australia"] == "ran"
+    second = storage.read_articles()
+    assert set(second.loc[second["qid"] == "Q1", "label"]) == {"political"}
+
+    status = pipeline.run(_stages(dpdp, api_url), processes=1)
+    assert {s for name, s in status.items() if name != "fetch"} == {"skipped"}
+
+
+def test_qids_rerun_once_the_ttl_passes(workdir, dpdp, wikidata_stub, model, monkeypatch):
+    api_url, calls, _ = wikidata_stub
+    pipeline.run(_stages(dpdp, api_url, ttl=3600), processes=1)
+    assert pipeline.run(_stages(dpdp, api_url, ttl=3600), processes=1)["qids:Canada"] == "skipped"
+
+    calls.clear()
+    now = time.time() + 7200
+    monkeypatch.setattr(pipeline.time, "time", lambda: now)
+    status = pipeline.run(_stages(dpdp, api_url, ttl=3600), processes=1)
+    assert status["qids:Canada"] == "ran"
+    assert calls
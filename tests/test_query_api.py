@@ -0,0 +1,88 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+from data_access import DataStore
+from query_api import QueryService, make_server
+
+DAYS = pd.date_range("2024-01-01", "2024-03-31", freq="D")
+
+
+@pytest.fixture
+def api(tmp_path):
+    rng = np.random.default_rng(19)
+    summary = pd.DataFrame([
+        (day, country, label, int(rng.integers(100, 1000)))
+        for day in DAYS for country in ["AU", "CA"] for label in ["political", "non-political"]
+    ], columns=["date", "country_code", "label", "views"])
+    path = str(tmp_path / "summary.parquet")
+    summary.to_parquet(path)
+
+    store = DataStore(datasets={"summary": ((path,), lambda: pd.read_parquet(path))})
+    server = make_server(port=0, service=QueryService(store))
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("query", [
+    "/totals?countries=AU",
+    "/series?granularity=monthly&max_points=2",
+    "/spikes?threshold=2&window=14",
+    "/shares?format=arrow",
+])
+def test_matching_etag_gets_an_empty_304(api, query):
+    first = requests.get(api + query)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    again = requests.get(api + query, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+
+    stale = requests.get(api + query, headers={"If-None-Match": '"something-else"'})
+    assert stale.status_code == 200
+    assert stale.content == first.content
+
+
+def test_gzip_is_used_when_accepted(api):
+    response = requests.get(api + "/series", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    body = response.json()
+    assert body["columns"] == ["date", "country_code", "political_views"]
+    assert len(body["data"]) == 2 * len(DAYS)
+
+
+@pytest.mark.parametrize("query", [
+    "/totals?start=yesterday-ish",
+    "/totals?format=xml",
+    "/series?granularity=weekly",
+    "/series?method=spline",
+    "/series?max_points=0",
+    "/series?max_points=many",
+    "/spikes?threshold=nan",
+    "/spikes?threshold=inf",
+    "/spikes?threshold=-Infinity",
+    "/spikes?window=0",
+    f"/spikes?window={len(DAYS) + 1}",
+    "/spikes?window=1e9",
+])
+def test_bad_parameters_get_a_400(api, query):
+    response = requests.get(api + query)
+
+    assert response.status_code == 400
+    assert response.json()["error"]
+
+
+def test_window_up_to_the_summary_length_is_accepted(api):
+    assert requests.get(api + f"/spikes?window={len(DAYS)}").status_code == 200
+
+
+def test_unknown_endpoint_is_a_404(api):
+    assert requests.get(api + "/nope").status_code == 404
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from range_index import LABELS, RangeIndex
+
+
+@pytest.fixture(scope="module")
+def summary():
+    """Daily (country, label) rows over three months, with gaps like the real summary."""
+    rng = np.random.default_rng(5)
+    days = pd.date_range("2024-01-20", "2024-04-10", freq="D")
+    rows = [
+        (day, country, label, int(rng.integers(0, 1000)))
+        for day in days
+        for country in ["AU", "CA", "IN"]
+        for label in LABELS
+        if rng.random() < 0.7
+    ]
+    df = pd.DataFrame(rows, columns=["date", "country_code", "label", "views"])
+    # A country that only has political views on one day
+    return pd.concat([df, pd.DataFrame([(pd.Timestamp("2024-03-03"), "GB", "political", 7)],
+                                       columns=df.columns)], ignore_index=True)
+
+
+# The pandas versions RangeIndex replaced in data_access.py
+
+def _filter(df, start=None, end=None, countries=None, labels=None):
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df["date"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df["date"] <= pd.Timestamp(end)
+    if countries is not None:
+        mask &= df["country_code"].isin(list(countries))
+    if labels is not None:
+        mask &= df["label"].isin(list(labels))
+    return df[mask]
+
+
+def groupby_totals(df, start, end, countries, labels):
+    df = _filter(df, start, end, countries, labels)
+    return df.groupby(["country_code", "label"])["views"].sum().reset_index()
+
+
+def groupby_shares(df, start, end, countries, labels):
+    agg = groupby_totals(df, start, end, countries, labels)
+    full_index = pd.MultiIndex.from_product([agg["country_code"].unique(), LABELS],
+                                            names=["country_code", "label"])
+    agg = agg.set_index(["country_code", "label"]).reindex(full_index, fill_value=0).reset_index()
+    agg["percent"] = agg["views"] / agg.groupby("country_code")["views"].transform("sum") * 100
+    return agg
+
+
+def groupby_series(df, start, end, countries, granularity):
+    df = _filter(df, start, end, countries, ["political"])
+    freq = "D" if granularity == "Daily" else "ME"
+    return df.groupby([pd.Grouper(key="date", freq=freq), "country_code"])["views"].sum().reset_index()
+
+
+def _same(actual, expected, by):
+    actual = actual.sort_values(by, ignore_index=True)
+    expected = expected.sort_values(by, ignore_index=True)
+    pd.testing.assert_frame_equal(actual, expected[list(actual.columns)], check_dtype=False)
+
+
+RANGES = [
+    (None, None),
+    ("2024-01-20", "2024-01-20"),
+    ("2024-02-10", "2024-03-17"),
+    ("2024-01-01", "2024-02-29"),   # starts before the first day
+    ("2024-03-31", "2024-12-31"),   # ends after the last day
+]
+FILTERS = [
+    (None, None),
+    (["CA", "GB"], None),
+    (None, ["political", "non-political"]),
+    (["IN"], ["No QID"]),
+]
+
+
+@pytest.mark.parametrize("start,end", RANGES)
+@pytest.mark.parametrize("countries,labels", FILTERS)
+def test_totals_and_shares_match_groupby(summary, start, end, countries, labels):
+    index = RangeIndex.from_frame(summary)
+
+    _same(index.label_totals(start, end, countries, labels),
+          groupby_totals(summary, start, end, countries, labels), ["country_code", "label"])
+    _same(index.label_shares(start, end, countries, labels),
+          groupby_shares(summary, start, end, countries, labels), ["country_code", "label"])
+
+
+@pytest.mark.parametrize("start,end", RANGES)
+@pytest.mark.parametrize("countries", [None, ["AU", "GB"]])
+@pytest.mark.parametrize("granularity", ["Daily", "Monthly"])
+def test_series_matches_groupby(summary, start, end, countries, granularity):
+    index = RangeIndex.from_frame(summary)
+
+    _same(index.series("political", start, end, countries, granularity),
+          groupby_series(summary, start, end, countries, granularity), ["date", "country_code"])
+
+
+def test_empty_range_has_no_rows(summary):
+    index = RangeIndex.from_frame(summary)
+
+    assert index.label_totals("2025-01-01", "2025-02-01").empty
+    assert index.series("political", "2024-03-01", "2024-02-01").empty
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from spikes import SpikeDetector, detect_spikes
+
+
+@pytest.fixture(scope="module")
+def summary():
+    """Political and non-political daily views for three countries, with planted spikes."""
+    rng = np.random.default_rng(9)
+    days = pd.date_range("2024-01-01", "2024-06-30", freq="D")
+    frames = []
+    for country, level in [("AU", 1000), ("CA", 5000), ("IN", 300)]:
+        views = rng.poisson(level, len(days))
+        views[rng.choice(len(days), 6, replace=False)] *= 4
+        for label, share in [("political", 1.0), ("non-political", 3.0)]:
+            frames.append(pd.DataFrame({"date": days, "country_code": country, "label": label,
+                                        "views": (views * share).astype(np.int64)}))
+    df = pd.concat(frames, ignore_index=True)
+    # IN has no rows at all for a stretch, and starts late
+    return df[~((df["country_code"] == "IN") & (df["date"] < "2024-01-20"))
+              & ~((df["country_code"] == "IN") & df["date"].between("2024-03-01", "2024-03-09"))]
+
+
+def _sorted(df):
+    return df.sort_values(["date", "country_code"], ignore_index=True)
+
+
+@pytest.mark.parametrize("baseline,window", [("rolling", 28), ("weekday", 4)])
+@pytest.mark.parametrize("batch_days", [1, 10, 45])
+def test_incremental_updates_match_a_full_run(summary, baseline, window, batch_days):
+    full = detect_spikes(summary, window=window, baseline=baseline, min_periods=3)
+    assert len(full) > 0
+
+    detector = SpikeDetector(window=window, baseline=baseline, min_periods=3)
+    days = pd.date_range(summary["date"].min(), summary["date"].max(), freq="D")
+    found = []
+    for i in range(0, len(days), batch_days):
+        batch = summary[summary["date"].between(days[i], days[min(i + batch_days, len(days)) - 1])]
+        found.append(detector.update(batch))
+
+    pd.testing.assert_frame_equal(_sorted(pd.concat(found, ignore_index=True)), _sorted(full))
+
+
+def test_rows_before_the_last_seen_day_are_ignored(summary):
+    detector = SpikeDetector(min_periods=3)
+    detector.update(summary[summary["date"] < "2024-04-01"])
+
+    assert detector.update(summary[summary["date"] < "2024-03-01"]).empty
+
+
+def test_days_without_political_rows(summary):
+    other = summary[summary["label"] != "political"]
+    detector = SpikeDetector(min_periods=3)
+
+    assert detect_spikes(other).empty
+    assert detector.update(other).empty
+    # A detector that has not seen political views yet still scores later days
+    spikes = detector.update(summary)
+    pd.testing.assert_frame_equal(_sorted(spikes), _sorted(detect_spikes(summary, min_periods=3)))
@@ -0,0 +1,71 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import stats
+from data_access import DataStore
+
+
+@pytest.fixture(scope="module")
+def summary_path(tmp_path_factory):
+    rng = np.random.default_rng(20)
+    days = pd.date_range("2024-01-01", "2024-12-31", freq="D")
+    rows = []
+    for country, share in [("AU", 0.10), ("GB", 0.12), ("IN", 0.10), ("US", 0.15)]:
+        for day in days:
+            total = int(rng.integers(5_000, 20_000))
+            political = int(total * rng.beta(share * 50, (1 - share) * 50))
+            rows += [(day, country, "political", political),
+                     (day, country, "non-political", total - political)]
+    path = str(tmp_path_factory.mktemp("stats") / "summary.parquet")
+    pd.DataFrame(rows, columns=["date", "country_code", "label", "views"]).to_parquet(path)
+    return path
+
+
+def _store(path):
+    return DataStore(datasets={"summary": ((path,), lambda: pd.read_parquet(path))})
+
+
+def _assert_same(a, b):
+    (ci_a, (stat_a, p_a)), (ci_b, (stat_b, p_b)) = a, b
+    pd.testing.assert_frame_equal(ci_a, ci_b)
+    assert (stat_a, p_a) == (stat_b, p_b)
+
+
+def test_share_tests_are_reproducible(summary_path):
+    first = _store(summary_path).share_tests(n_resamples=3_000)
+    second = _store(summary_path).share_tests(n_resamples=3_000)
+
+    _assert_same(first, second)
+    ci, (statistic, p) = first
+    assert list(ci["country_code"]) == ["AU", "GB", "IN", "US"]
+    assert (ci["ci_low"] < ci["mean_share"]).all() and (ci["mean_share"] < ci["ci_high"]).all()
+    assert p < 0.01
+
+
+def test_share_tests_do_not_depend_on_the_pool(summary_path):
+    # make_pool returns None on one core; the point here is that a pool changes nothing
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pooled = _store(summary_path).share_tests(n_resamples=3_000, pool=pool)
+
+    _assert_same(pooled, _store(summary_path).share_tests(n_resamples=3_000))
+
+
+def test_the_seed_changes_the_draws(summary_path):
+    shares = stats.daily_shares(pd.read_parquet(summary_path))
+
+    same = stats.bootstrap_means(shares.to_numpy(), 2_500, seed=1)
+    assert np.array_equal(same, stats.bootstrap_means(shares.to_numpy(), 2_500, seed=1))
+    assert not np.array_equal(same, stats.bootstrap_means(shares.to_numpy(), 2_500, seed=2))
+
+
+def test_window_results_do_not_depend_on_the_other_countries(summary_path):
+    shares = stats.daily_shares(pd.read_parquet(summary_path))
+
+    everyone = stats.window_comparison(shares, n_resamples=2_000)
+    alone = stats.window_comparison(shares[["IN"]], n_resamples=2_000)
+
+    pd.testing.assert_frame_equal(everyone[everyone["country_code"] == "IN"].reset_index(drop=True), alone)
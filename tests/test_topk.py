@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from topk import TopK, stream_top_k
+
+
+@pytest.fixture(scope="module")
+def articles():
+    """Article rows with few distinct view counts, so many rows tie."""
+    rng = np.random.default_rng(10)
+    n = 5000
+    return pd.DataFrame({
+        "country": rng.choice(["Australia", "Canada", "India"], n),
+        "date": rng.choice(pd.date_range("2024-01-01", periods=20).strftime("%Y-%m-%d"), n),
+        "article": [f"A{i}" for i in range(n)],
+        "label": rng.choice(["political", "non-political"], n),
+        "views": rng.integers(0, 8, n),
+    })
+
+
+def expected_top(df, k, keys=("country", "date")):
+    keys = list(keys)
+    top = df.sort_values("views", ascending=False, kind="stable").groupby(keys).head(k)
+    return top.sort_values(keys, kind="stable", ignore_index=True)
+
+
+def _chunks(df, size):
+    return [df.iloc[i:i + size] for i in range(0, len(df), size)]
+
+
+@pytest.mark.parametrize("k", [1, 3, 50])
+@pytest.mark.parametrize("chunk_size", [13, 97, 5000])
+def test_matches_sort_and_head_including_ties(articles, k, chunk_size):
+    top = TopK(k)
+    for chunk in _chunks(articles, chunk_size):
+        top.add(chunk)
+
+    pd.testing.assert_frame_equal(top.result(), expected_top(articles, k))
+
+
+def test_labels_and_only_filter_the_rows(articles):
+    only = pd.DataFrame({"country": ["Canada", "India"], "date": ["2024-01-05", "2024-01-17"]})
+
+    result = stream_top_k(_chunks(articles, 400), k=3, labels=["political"], only=only)
+
+    rows = articles[(articles["label"] == "political")
+                    & articles[["country", "date"]].apply(tuple, axis=1).isin(set(only.apply(tuple, axis=1)))]
+    pd.testing.assert_frame_equal(result, expected_top(rows, 3))
+    assert sorted(set(zip(result["country"], result["date"]))) == [("Canada", "2024-01-05"),
+                                                                  ("India", "2024-01-17")]
+
+
+def test_no_rows_gives_an_empty_frame():
+    top = TopK(3)
+    top.add(pd.DataFrame(columns=["country", "date", "views"]))
+
+    assert top.result().empty
@@ -0,0 +1,133 @@
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+import wikidata
+from labeling import label_qids
+from qid_cache import QidCache
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    # Keep the Retry-After the stub sends, skip the exponential waits
+    original = wikidata._backoff
+    monkeypatch.setattr(wikidata, "_backoff",
+                        lambda attempt, response=None, **kw: original(attempt, response, base=0))
+
+
+def _ids(path):
+    return parse_qs(urlparse(path).query)["ids"][0].split("|")
+
+
+def _entities(ids, missing=()):
+    entities = {}
+    for qid in ids:
+        if qid in missing:
+            entities[qid] = {"id": qid, "missing": ""}
+        else:
+            entities[qid] = {"id": qid, "descriptions": {"en": {"language": "en", "value": f"about {qid}"}}}
+    return json.dumps({"entities": entities}).encode()
+
+
+def wbgetentities(fail=None, missing=()):
+    """A stub wbgetentities; fail(n) may return a (status, body, headers) for the nth request."""
+    calls = []
+
+    def respond(path):
+        calls.append(path)
+        if fail is not None:
+            failure = fail(len(calls))
+            if failure is not None:
+                return failure
+        return 200, _entities(_ids(path), missing), {"Content-Type": "application/json"}
+
+    return respond
+
+
+def test_qids_are_deduplicated_and_sent_in_batches_of_50(serve):
+    api_url, calls = serve(wbgetentities(missing={"Q7"}))
+    qids = [f"Q{i}" for i in range(1, 121)] + ["Q5", "Q5 ", None, "not a qid", "Q0"]
+
+    result = wikidata.fetch_descriptions(qids, api_url=api_url, max_workers=3)
+
+    batches = sorted((_ids(path) for path in calls), key=len, reverse=True)
+    assert [len(b) for b in batches] == [50, 50, 20]
+    assert sorted(q for b in batches for q in b) == sorted(f"Q{i}" for i in range(1, 121))
+    assert result["Q5"] == {"en": "about Q5"}
+    assert result["Q7"] == {}
+    assert len(result) == 120
+
+
+def test_429_is_retried(serve):
+    too_many = (429, b"slow down", {"Retry-After": "0"})
+    api_url, calls = serve(wbgetentities(fail=lambda n: too_many if n <= 2 else None))
+
+    result = wikidata.fetch_batch(requests.Session(), ["Q1", "Q2"], api_url=api_url)
+
+    assert len(calls) == 3
+    assert result == {"Q1": {"en": "about Q1"}, "Q2": {"en": "about Q2"}}
+
+
+def test_truncated_json_is_retried(serve):
+    api_url, calls = serve(wbgetentities(fail=lambda n: (200, b'{"entit', {}) if n == 1 else None))
+
+    assert wikidata.fetch_batch(requests.Session(), ["Q1"], api_url=api_url) == {"Q1": {"en": "about Q1"}}
+    assert len(calls) == 2
+
+
+def test_client_error_is_not_retried(serve):
+    api_url, calls = serve(wbgetentities(fail=lambda n: (403, b"forbidden", {})))
+
+    with pytest.raises(wikidata.WikidataError):
+        wikidata.fetch_batch(requests.Session(), ["Q1"], api_url=api_url)
+    assert len(calls) == 1
+
+
+def test_failing_batch_does_not_stop_the_others(serve):
+    def respond(path):
+        if "Q1" in _ids(path):
+            return 503, b"unavailable", {}
+        return 200, _entities(_ids(path)), {}
+
+    api_url, calls = serve(respond)
+
+    with pytest.raises(wikidata.FetchFailed) as failed:
+        wikidata.fetch_descriptions(["Q1", "Q2", "Q3"], batch_size=1, api_url=api_url, retries=2)
+
+    assert failed.value.descriptions == {"Q2": {"en": "about Q2"}, "Q3": {"en": "about Q3"}}
+    assert failed.value.failed == ["Q1"]
+    assert sum("Q1" in _ids(path) for path in calls) == 3
+
+
+def test_invalid_url_is_not_retried(monkeypatch):
+    calls = []
+    session = requests.Session()
+    original = session.get
+    monkeypatch.setattr(session, "get", lambda *a, **kw: calls.append(a) or original(*a, **kw))
+
+    with pytest.raises(wikidata.WikidataError):
+        wikidata.fetch_batch(session, ["Q1"], api_url="http://")
+    assert len(calls) == 1
+
+
+def test_failed_qids_stay_uncached_for_the_next_run(serve, tmp_path):
+    def respond(path):
+        if "Q1" in _ids(path):
+            return 503, b"unavailable", {}
+        return 200, _entities(_ids(path), missing={"Q3"}), {}
+
+    api_url, _ = serve(respond)
+
+    def fetch(qids):
+        return wikidata.fetch_descriptions(qids, batch_size=1, api_url=api_url, retries=0)
+
+    def classify(texts):
+        return ["political"] * len(texts)
+
+    with QidCache(str(tmp_path / "cache.sqlite")) as cache:
+        with pytest.raises(wikidata.FetchFailed):
+            label_qids(["Q1", "Q2", "Q3"], cache, classify, "v1", fetch=fetch)
+        assert cache.get_many(["Q2", "Q3"]) == {"Q2": ("about Q2", "political"), "Q3": ("N/A", "No QID")}
+        assert cache.needs_fetch(["Q1", "Q2", "Q3"]) == ["Q1"]
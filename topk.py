@@ -0,0 +1,87 @@
+# Streaming top-K rows per group.
+#
+# Article rows are read chunk by chunk and only the K most viewed rows of each
+# (country, date) key are kept, in a small min-heap per key. Memory is
+# O(keys x K) plus one chunk, instead of holding and sorting every row.
+import heapq
+import itertools
+
+import pandas as pd
+
+
+def iter_csv_chunks(paths, chunksize=200_000, **read_csv_kwargs):
+    """Yield DataFrame chunks from one or more CSV files."""
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        yield from pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs)
+
+
+class TopK:
+    """Keeps the k rows with the largest value for every key."""
+
+    def __init__(self, k=3, keys=("country", "date"), value="views"):
+        self.k = k
+        self.keys = list(keys)
+        self.value = value
+        self.heaps = {}
+        self.columns = None
+        self._seq = itertools.count()
+
+    def add(self, chunk):
+        if chunk.empty:
+            return
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+
+        # Cut each chunk down to its own top k per key first (vectorized), so only
+        # a few rows per key go through the Python heap code
+        chunk = chunk.sort_values(self.value, ascending=False, kind="stable")
+        chunk = chunk.groupby(self.keys, sort=False, observed=True).head(self.k)
+
+        key_cols = [chunk.columns.get_loc(c) for c in self.keys]
+        value_col = chunk.columns.get_loc(self.value)
+        for row in chunk.itertuples(index=False, name=None):
+            key = tuple(row[i] for i in key_cols)
+            # seq breaks ties in favour of the row seen first, like a stable sort
+            entry = (row[value_col], -next(self._seq), row)
+            heap = self.heaps.setdefault(key, [])
+            if len(heap) < self.k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+    def result(self):
+        """The kept rows, sorted by key and then by value (largest first)."""
+        rows = [entry[2] for key in sorted(self.heaps)
+                for entry in sorted(self.heaps[key], reverse=True)]
+        return pd.DataFrame(rows, columns=self.columns)
+
+
+def stream_top_k(chunks, k=3, keys=("country", "date"), value="views", labels=None, only=None):
+    """Top k rows per key over an iterable of DataFrame chunks.
+
+    labels keeps only rows with those labels; only is a DataFrame of key values
+    (e.g. spike days) and keeps only rows matching one of them. Without only,
+    every key (e.g. every day of every country) gets its top k.
+    """
+    top = TopK(k, keys, value)
+    wanted = None if only is None else _key_index(only, only.columns)
+    for chunk in chunks:
+        if labels is not None:
+            chunk = chunk[chunk["label"].isin(list(labels))]
+        if only is not None:
+            chunk = chunk[_key_index(chunk, only.columns).isin(wanted)]
+        top.add(chunk)
+    return top.result()
+
+
+def _key_index(df, columns):
+    # Compare keys as strings so CSV chunks (text dates) and Parquet chunks (timestamps) both match
+    parts = {}
+    for col in columns:
+        if col == "date":
+            parts[col] = pd.to_datetime(df[col]).dt.strftime("%Y-%m-%d")
+        else:
+            parts[col] = df[col].astype(str)
+    return pd.MultiIndex.from_frame(pd.DataFrame(parts))
@@ -0,0 +1,162 @@
+# Batched Wikidata description fetcher.
+#
+# Instead of one Special:EntityData request per QID, QIDs are deduplicated and
+# sent 50 at a time to the wbgetentities API, with a few batches in flight at
+# once. 429 and 5xx responses, dropped connections and truncated bodies are
+# retried with exponential backoff (honouring Retry-After), and every requested
+# language comes back in the same response. A batch that still fails does not
+# stop the others: fetch_descriptions raises FetchFailed at the end, carrying
+# every description that did come back and the QIDs that did not.
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+API_URL = "https://www.wikidata.org/w/api.php"
+USER_AGENT = "Student project"
+
+# wbgetentities accepts at most 50 ids per request for normal users
+BATCH_SIZE = 50
+
+QID_RE = re.compile(r"^Q[1-9][0-9]*$")
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class WikidataError(Exception):
+    """Raised when a batch still fails after all retries."""
+
+
+class FetchFailed(WikidataError):
+    """Some batches failed: .descriptions has what came back, .failed the QIDs that did not."""
+
+    def __init__(self, message, descriptions, failed):
+        super().__init__(message)
+        self.descriptions = descriptions
+        self.failed = failed
+
+
+class _Retry(WikidataError):
+    pass
+
+
+# Failures worth another attempt; JSONDecodeError is a truncated or non-JSON body
+TRANSIENT_ERRORS = (_Retry, requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError, requests.exceptions.JSONDecodeError)
+
+
+def unique_qids(*collections):
+    """Deduplicate QIDs from any number of iterables, dropping missing or malformed ids."""
+    seen = {}
+    for qids in collections:
+        for qid in qids:
+            if isinstance(qid, str) and QID_RE.match(qid.strip()):
+                seen.setdefault(qid.strip(), None)
+    return list(seen)
+
+
+def batches(items, size=BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _backoff(attempt, response=None, base=1.0, cap=60.0):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return min(cap, base * 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+def fetch_batch(session, qids, languages=("en",), api_url=API_URL, retries=5, timeout=30):
+    """Fetch descriptions for up to 50 QIDs in one wbgetentities request.
+
+    Returns {qid: {language: description}}; QIDs that do not exist map to {}.
+    """
+    params = {
+        "action": "wbgetentities",
+        "ids": "|".join(qids),
+        "props": "descriptions",
+        "languages": "|".join(languages),
+        "format": "json",
+        "maxlag": 5,
+    }
+
+    for attempt in range(retries + 1):
+        response = None
+        try:
+            response = session.get(api_url, params=params, timeout=timeout)
+            if response.status_code in RETRY_STATUS:
+                raise _Retry(f"HTTP {response.status_code}")
+            response.raise_for_status()
+
+            data = response.json()
+            if not isinstance(data, dict):
+                raise _Retry("response is not a JSON object")
+            # The server is lagging; it asks us to come back later
+            if data.get("error", {}).get("code") == "maxlag":
+                raise _Retry("maxlag")
+            if "error" in data:
+                error = data["error"]
+                raise WikidataError(error.get("info", error) if isinstance(error, dict) else error)
+            break
+        except TRANSIENT_ERRORS as e:
+            if attempt == retries:
+                raise WikidataError(f"batch starting {qids[0]} failed: {e}") from e
+            time.sleep(_backoff(attempt, response))
+        except (WikidataError, requests.RequestException) as e:
+            # API errors and other 4xx responses: retrying would get the same answer
+            raise WikidataError(f"batch starting {qids[0]} failed: {e}") from e
+
+    result = {}
+    for qid in qids:
+        entity = data.get("entities", {}).get(qid, {})
+        descriptions = entity.get("descriptions", {})
+        result[qid] = {lang: d["value"] for lang, d in descriptions.items() if "value" in d}
+    return result
+
+
+def fetch_descriptions(qids, languages=("en",), batch_size=BATCH_SIZE, max_workers=4,
+                       api_url=API_URL, retries=5):
+    """Fetch descriptions for many QIDs with a bounded number of concurrent batch requests.
+
+    QIDs are deduplicated first. Returns {qid: {language: description}}, where
+    {} means the QID has no description. If any batch keeps failing, the
+    others still run and FetchFailed is raised once they are done.
+    """
+    qids = unique_qids(qids)
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+
+    def run(batch):
+        try:
+            return fetch_batch(session, batch, languages, api_url, retries), None
+        except WikidataError as e:
+            return None, e
+
+    descriptions = {}
+    failed = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        chunks = list(batches(qids, batch_size))
+        for batch, (result, error) in zip(chunks, pool.map(run, chunks)):
+            if error is None:
+                descriptions.update(result)
+            else:
+                failed.extend(batch)
+                errors.append(error)
+    if errors:
+        raise FetchFailed(f"{len(errors)} of {len(chunks)} batches failed, first: {errors[0]}",
+                          descriptions, failed)
+    return descriptions
+
+
+def get_wikidata_description(qid, retries=5, language="en", api_url=API_URL):
+    """Description of a single QID, or "empty" if there is none (the notebook's old helper)."""
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    try:
+        result = fetch_batch(session, [qid], (language,), api_url, retries)
+    except WikidataError:
+        return "empty"
+    return result.get(qid, {}).get(language, "empty")